@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""Per-filter execution profile of a VTK pipeline.
+
+Every algorithm invokes a StartEvent right before it executes and an
+EndEvent right after, and a mapper does the same around its render.
+PipelineProfiler observes these events and records, for each
+execution, the wall time, the number of input and output cells and the
+memory used by the output. It prints a summary table and exports the
+executions as a trace for chrome://tracing, Perfetto or speedscope, and
+as folded stacks for flamegraph.pl. In the folded stacks an algorithm
+sits under the algorithms that consume its output, so the flame graph
+shows where the time goes along each branch of the pipeline.
+
+As a library, attach it to the end of a pipeline before updating it:
+
+    profiler = PipelineProfiler()
+    profiler.attach_upstream(mapper)
+    render_window.Render()
+    profiler.print_summary()
+    profiler.write_trace("trace.json")
+
+As a script, it runs an example headless in an empty directory, as
+run_examples.py does. Until the first render it attaches to every
+algorithm the example calls a method on, which is before the algorithm
+first executes, and then to everything upstream of those:
+
+    python benchmarks/pipeline_profiler.py chapter05/examples/stream_surface.py \\
+        --trace stream_surface.json --folded stream_surface.folded
+"""
+
+import argparse
+import collections
+import json
+import os
+import runpy
+import sys
+import tempfile
+import time
+
+Execution = collections.namedtuple(
+    "Execution", "name class_name start duration input_cells output_cells output_kib")
+
+
+def _cells(data):
+    """Returns the number of cells (edges, rows) in a data object."""
+    if data is None:
+        return None
+    for method in ("GetNumberOfCells", "GetNumberOfEdges", "GetNumberOfRows"):
+        if hasattr(data, method):
+            return getattr(data, method)()
+    return None
+
+
+def _sum(values):
+    values = [value for value in values if value is not None]
+    return sum(values) if values else None
+
+
+def _inputs(algorithm):
+    for port in range(algorithm.GetNumberOfInputPorts()):
+        for i in range(algorithm.GetNumberOfInputConnections(port)):
+            yield port, i
+
+
+class PipelineProfiler:
+    """Records the executions of the algorithms it is attached to."""
+
+    def __init__(self):
+        self.executions = []
+        self._algorithms = {}
+        self._open = []
+        self._origin = time.perf_counter()
+
+    def attach(self, algorithm, name=None):
+        """Observes one algorithm; name defaults to its class name."""
+        key = algorithm.GetAddressAsString("vtkObject")
+        if key in self._algorithms:
+            return
+        if name is None:
+            name = algorithm.GetClassName()
+        taken = {entry[1] for entry in self._algorithms.values()}
+        label, copy = name, 2
+        while label in taken:
+            label, copy = f"{name}#{copy}", copy + 1
+        tags = (algorithm.AddObserver("StartEvent", self._start),
+                algorithm.AddObserver("EndEvent", self._end))
+        self._algorithms[key] = (algorithm, label, tags)
+
+    def attach_upstream(self, algorithm):
+        """Observes an algorithm and every algorithm upstream of it."""
+        pending = [algorithm]
+        while pending:
+            algorithm = pending.pop()
+            if algorithm.IsA("vtkTrivialProducer"):
+                continue
+            self.attach(algorithm)
+            for port, i in _inputs(algorithm):
+                pending.append(algorithm.GetInputAlgorithm(port, i))
+
+    def detach(self):
+        for algorithm, _, tags in self._algorithms.values():
+            for tag in tags:
+                algorithm.RemoveObserver(tag)
+        self._algorithms.clear()
+
+    def _label(self, algorithm):
+        entry = self._algorithms.get(algorithm.GetAddressAsString("vtkObject"))
+        return entry[1] if entry else algorithm.GetClassName()
+
+    def _start(self, algorithm, event):
+        input_cells = _sum(_cells(algorithm.GetInputDataObject(port, i))
+                           for port, i in _inputs(algorithm))
+        self._open.append((algorithm, time.perf_counter(), input_cells))
+
+    def _end(self, algorithm, event):
+        end = time.perf_counter()
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index][0] is algorithm:
+                break
+        else:
+            return
+        _, start, input_cells = self._open.pop(index)
+        outputs = [algorithm.GetOutputDataObject(port)
+                   for port in range(algorithm.GetNumberOfOutputPorts())]
+        self.executions.append(Execution(
+            self._label(algorithm), algorithm.GetClassName(), start - self._origin,
+            end - start, input_cells, _sum(_cells(output) for output in outputs),
+            _sum(output.GetActualMemorySize() for output in outputs
+                 if output is not None)))
+
+    def summary(self):
+        """Returns one row per algorithm, the most expensive first."""
+        rows = {}
+        for execution in self.executions:
+            row = rows.setdefault(execution.name, {
+                "name": execution.name, "class_name": execution.class_name,
+                "executions": 0, "total_s": 0.0, "max_s": 0.0})
+            row["executions"] += 1
+            row["total_s"] += execution.duration
+            row["max_s"] = max(row["max_s"], execution.duration)
+            # The sizes are those of the latest execution.
+            row["input_cells"] = execution.input_cells
+            row["output_cells"] = execution.output_cells
+            row["output_kib"] = execution.output_kib
+        return sorted(rows.values(), key=lambda row: row["total_s"], reverse=True)
+
+    def print_summary(self, file=sys.stdout):
+        rows = self.summary()
+        total = sum(row["total_s"] for row in rows) or 1.0
+        print(f"{'algorithm':40} {'runs':>5} {'total ms':>10} {'share':>6} "
+              f"{'in cells':>10} {'out cells':>10} {'out KiB':>10}", file=file)
+        for row in rows:
+            print(f"{row['name'][:40]:40} {row['executions']:5d} "
+                  f"{1000 * row['total_s']:10.2f} {100 * row['total_s'] / total:5.1f}% "
+                  f"{_format(row['input_cells']):>10} {_format(row['output_cells']):>10} "
+                  f"{_format(row['output_kib']):>10}", file=file)
+
+    def write_trace(self, path):
+        """Writes the executions in the Chrome trace event format."""
+        events = [{
+            "name": execution.name, "cat": execution.class_name, "ph": "X",
+            "ts": 1e6 * execution.start, "dur": 1e6 * execution.duration,
+            "pid": os.getpid(), "tid": 0,
+            "args": {"input_cells": execution.input_cells,
+                     "output_cells": execution.output_cells,
+                     "output_kib": execution.output_kib},
+        } for execution in self.executions]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def write_folded(self, path):
+        """Writes folded stacks, in microseconds, for flamegraph.pl."""
+        stacks = collections.Counter()
+        chains = self._consumer_chains()
+        for execution in self.executions:
+            stacks[chains.get(execution.name, execution.name)] += execution.duration
+        with open(path, "w") as f:
+            for stack, seconds in sorted(stacks.items()):
+                f.write(f"{stack} {max(1, round(1e6 * seconds))}\n")
+
+    def _consumer_chains(self):
+        """Maps each algorithm to "sink;...;consumer;algorithm"."""
+        consumer = {}
+        for algorithm, label, _ in self._algorithms.values():
+            for port, i in _inputs(algorithm):
+                producer = self._label(algorithm.GetInputAlgorithm(port, i))
+                consumer.setdefault(producer, label)
+        chains = {}
+        for _, label, _ in self._algorithms.values():
+            chain = [label]
+            while chain[-1] in consumer and consumer[chain[-1]] not in chain:
+                chain.append(consumer[chain[-1]])
+            chains[label] = ";".join(reversed(chain))
+        return chains
+
+
+def _format(value):
+    return "-" if value is None else f"{value:,}"
+
+
+def _attach_on_first_call(profiler, algorithms):
+    """Returns a profile hook that attaches to algorithms as they are used.
+
+    The algorithm is named after the script variable that holds it, and
+    added to algorithms, which keeps it alive while the hook runs.
+    """
+    from vtkmodules.vtkCommonExecutionModel import vtkAlgorithm
+
+    def hook(frame, event, arg):
+        if event != "c_call":
+            return
+        algorithm = getattr(arg, "__self__", None)
+        if not isinstance(algorithm, vtkAlgorithm) or algorithm in algorithms:
+            return
+        algorithms.add(algorithm)
+        names = [name for name, value in frame.f_locals.items() if value is algorithm]
+        profiler.attach(algorithm, names[0] if names else None)
+
+    return hook
+
+
+def _first_render_probe(run_examples, on_first_render):
+    """Returns a FirstRender probe that calls on_first_render once, first."""
+
+    class Probe(run_examples.FirstRender):
+        def __init__(self, start):
+            super().__init__(start)
+            self.on_first_render = on_first_render
+
+        def measure(self, update, render):
+            if self.on_first_render is not None:
+                callback, self.on_first_render = self.on_first_render, None
+                callback()
+            return super().measure(update, render)
+
+    return Probe(time.perf_counter())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("script", help="the example script to profile")
+    parser.add_argument("--trace", help="write a Chrome trace event file")
+    parser.add_argument("--folded", help="write folded stacks for flamegraph.pl")
+    args = parser.parse_args()
+
+    import run_examples
+
+    script = os.path.abspath(args.script)
+    outputs = [os.path.abspath(path) if path else None for path in (args.trace, args.folded)]
+
+    profiler = PipelineProfiler()
+    algorithms = set()
+
+    def stop_hook():
+        # The hook slows down every call the script makes, Python filters
+        # included, so it only runs until the first render. Algorithms
+        # the script never touched are found upstream of those it did.
+        sys.setprofile(None)
+        for algorithm in algorithms:
+            profiler.attach_upstream(algorithm)
+
+    run_examples.install_hooks(_first_render_probe(run_examples, stop_hook))
+    # Run in an empty directory, as run_examples.py does, so that files
+    # the example writes next to it stay out of the source tree.
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="vtk_example_") as work_dir:
+        os.chdir(work_dir)
+        sys.argv = [script, "--non-interactive"]
+        sys.path.insert(0, os.path.dirname(script))
+        sys.setprofile(_attach_on_first_call(profiler, algorithms))
+        try:
+            runpy.run_path(script, run_name="__main__")
+        finally:
+            sys.setprofile(None)
+            os.chdir(cwd)
+
+    profiler.print_summary()
+    trace, folded = outputs
+    if trace:
+        profiler.write_trace(trace)
+        print(f"Trace written to {trace}")
+    if folded:
+        profiler.write_folded(folded)
+        print(f"Folded stacks written to {folded}")
+    sys.stdout.flush()
+    # Skip interpreter teardown, as run_examples.py does.
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
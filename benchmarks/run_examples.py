@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""Runs every example script headless and writes a JSON timing report.
+
+Each script under chapter*/examples runs in its own Python process with
+offscreen rendering forced and the interactor event loop suppressed, so
+scripts that call interactor.Start() unconditionally finish as well. For
+every script the report records
+
+- pipeline_s: from the start of the script until everything the first
+  render draws is up to date (the mappers, or the view, are updated just
+  before the first render so that the render time is the render alone),
+- first_render_s: the first render,
+- total_s: the whole script, including any later renders,
+- peak_rss_mb: the peak resident set size of the process.
+
+Reports from two VTK versions (or two builds) can be compared with
+--compare, which exits with status 1 when a script got slower or larger
+than --threshold allows, or stopped working:
+
+    python benchmarks/run_examples.py -o vtk-9.3.json
+    python benchmarks/run_examples.py -o vtk-9.4.json --compare vtk-9.3.json
+
+Scripts that import a missing module (Boost graph algorithms, a GUI
+toolkit) are reported as "unavailable" rather than failing.
+"""
+
+import argparse
+import glob
+import importlib
+import json
+import os
+import platform
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# These examples hand control to another toolkit's event loop.
+TOOLKIT_EXAMPLES = {"QtCone.py", "QtConeScheduler.py", "TrameCone.py", "ImGuiCone.py"}
+
+METRICS = ("pipeline_s", "first_render_s", "total_s", "peak_rss_mb")
+
+# Differences below these are noise, whatever the relative change.
+MIN_DIFFERENCE = {"pipeline_s": 0.05, "first_render_s": 0.05, "total_s": 0.1,
+                  "peak_rss_mb": 10.0}
+
+# Classes that create their own render window, by module.
+HOOKED_CLASSES = (
+    ("vtkmodules.vtkViewsInfovis", ("vtkRenderView", "vtkGraphLayoutView",
+                                    "vtkHierarchicalGraphView", "vtkTreeMapView",
+                                    "vtkTreeRingView", "vtkIcicleView")),
+    ("vtkmodules.vtkInteractionImage", ("vtkImageViewer", "vtkImageViewer2",
+                                        "vtkResliceImageViewer")),
+)
+
+
+def find_examples(patterns=()):
+    """Returns the example scripts, relative to the repository root."""
+    scripts = sorted(os.path.relpath(path, ROOT) for path in
+                     glob.glob(os.path.join(ROOT, "chapter*", "examples", "*.py")))
+    if patterns:
+        scripts = [script for script in scripts
+                   if any(pattern in script for pattern in patterns)]
+    return scripts
+
+
+class FirstRender:
+    """Times the first render of the script and what it waits for."""
+
+    def __init__(self, start):
+        self.start = start
+        self.pipeline = None
+        self.render = None
+        self._busy = False
+
+    def measure(self, update, render):
+        if self.render is not None or self._busy:
+            return render()
+        self._busy = True
+        try:
+            update()
+            ready = time.perf_counter()
+            result = render()
+            self.pipeline = ready - self.start
+            self.render = time.perf_counter() - ready
+        finally:
+            self._busy = False
+        return result
+
+
+def _update_window(window):
+    """Updates the mappers of every prop the window will draw."""
+    for renderer in window.GetRenderers():
+        props = renderer.GetViewProps()
+        for i in range(props.GetNumberOfItems()):
+            get_mapper = getattr(props.GetItemAsObject(i), "GetMapper", None)
+            mapper = get_mapper() if get_mapper else None
+            if (mapper is not None and mapper.GetNumberOfInputPorts()
+                    and mapper.GetNumberOfInputConnections(0)):
+                mapper.Update()
+
+
+def _offscreen(window):
+    if window is not None and not window.GetOffScreenRendering():
+        window.OffScreenRenderingOn()
+
+
+def install_hooks(probe):
+    """Makes render windows offscreen and interactors return at once.
+
+    The hooks are Python overrides of the concrete classes the object
+    factory creates. They also apply to objects created in C++, such as
+    the render window of a view, once Python gets hold of them.
+    """
+    import vtkmodules.vtkInteractionStyle  # noqa: F401
+    import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+    from vtkmodules.vtkRenderingCore import vtkRenderWindow, vtkRenderWindowInteractor
+
+    window_class = type(vtkRenderWindow())
+    interactor_class = type(vtkRenderWindowInteractor())
+
+    class BenchmarkRenderWindow(window_class):
+        def Render(self):
+            _offscreen(self)
+            return probe.measure(lambda: _update_window(self), super().Render)
+
+    class BenchmarkInteractor(interactor_class):
+        def _render(self):
+            window = self.GetRenderWindow()
+            if window is not None:
+                _offscreen(window)
+                probe.measure(lambda: _update_window(window), window.Render)
+
+        def Initialize(self):
+            self._render()
+            super().Initialize()
+
+        def Start(self):
+            # Render once, as the event loop would, but never enter it.
+            self._render()
+
+    window_class.override(BenchmarkRenderWindow)
+    interactor_class.override(BenchmarkInteractor)
+
+    for module, names in HOOKED_CLASSES:
+        try:
+            module = importlib.import_module(module)
+        except ImportError:
+            continue
+        for name in names:
+            base = getattr(module, name, None)
+            if base is not None:
+                base.override(_benchmark_viewer(base, probe))
+
+
+def _benchmark_viewer(base, probe):
+    """Hooks a view or image viewer, which owns its render window."""
+
+    class BenchmarkViewer(base):
+        def __init__(self):
+            _offscreen(self.GetRenderWindow())
+            if hasattr(self, "GetInteractor"):
+                # With a StartEvent observer, Start() invokes it instead
+                # of running the event loop.
+                self.GetInteractor().AddObserver("StartEvent", self._start)
+
+        def _update(self):
+            if hasattr(self, "Update"):
+                self.Update()
+            else:
+                _update_window(self.GetRenderWindow())
+
+        def _start(self, caller, event):
+            probe.measure(self._update, self.GetRenderWindow().Render)
+
+        def Render(self):
+            return probe.measure(self._update, super().Render)
+
+    BenchmarkViewer.__name__ = f"Benchmark{base.__name__}"
+    return BenchmarkViewer
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+def run_child(script, result_path):
+    """Runs one example in this process and writes its result as JSON."""
+    probe = FirstRender(time.perf_counter())
+    result = {"status": "ok"}
+    try:
+        install_hooks(probe)
+        # Time the script, not the imports the hooks need.
+        probe.start = time.perf_counter()
+        sys.argv = [script, "--non-interactive"]
+        sys.path.insert(0, os.path.dirname(script))
+        runpy.run_path(script, run_name="__main__")
+    except ImportError as error:
+        result = {"status": "unavailable", "error": str(error)}
+    except SystemExit as error:
+        if error.code not in (None, 0):
+            result = {"status": "error", "error": f"exit status {error.code}"}
+    except BaseException:
+        result = {"status": "error",
+                  "error": traceback.format_exc().strip().splitlines()[-1]}
+    result["total_s"] = time.perf_counter() - probe.start
+    result["pipeline_s"] = probe.pipeline
+    result["first_render_s"] = probe.render
+    result["peak_rss_mb"] = _peak_rss_mb()
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+    # Skip interpreter teardown; some examples leave threads or windows.
+    os._exit(0)
+
+
+def run_example(script, timeout):
+    """Runs one example in a new process and returns its result."""
+    if os.path.basename(script) in TOOLKIT_EXAMPLES:
+        return {"status": "skipped", "error": "runs its own GUI event loop"}
+    path = os.path.abspath(os.path.join(ROOT, script))
+    # The example runs in an empty directory of its own, so that any files
+    # it writes next to it do not end up in the source tree.
+    with tempfile.TemporaryDirectory() as scratch, \
+            tempfile.TemporaryDirectory(prefix="vtk_example_") as work_dir:
+        result_path = os.path.join(scratch, "result.json")
+        command = [sys.executable, os.path.abspath(__file__), "--child", path, result_path]
+        try:
+            process = subprocess.run(command, cwd=work_dir, timeout=timeout,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                     text=True, errors="replace")
+        except subprocess.TimeoutExpired:
+            return {"status": "timeout", "error": f"no result after {timeout} s"}
+        if not os.path.exists(result_path):
+            if process.returncode < 0:
+                return {"status": "crashed", "error": f"signal {-process.returncode}"}
+            lines = process.stderr.strip().splitlines()
+            return {"status": "error", "error": lines[-1] if lines
+                    else f"exit status {process.returncode}"}
+        with open(result_path) as f:
+            return json.load(f)
+
+
+def _best(results):
+    """Keeps the smallest value of each metric over the successful runs.
+
+    A script that never succeeded is reported with its first failure.
+    """
+    successes = [r for r in results if r["status"] == "ok"]
+    if not successes:
+        return dict(results[0])
+    best = dict(successes[0])
+    for metric in METRICS:
+        values = [r[metric] for r in successes if r.get(metric) is not None]
+        best[metric] = min(values) if values else None
+    return best
+
+
+def vtk_version():
+    try:
+        from vtkmodules.vtkCommonCore import vtkVersion
+    except ImportError:
+        return None
+    return vtkVersion.GetVTKVersion()
+
+
+def compare(old, new, threshold):
+    """Prints the changes between two reports and returns the regressions."""
+    regressions = []
+    print(f"\nVTK {old.get('vtk_version')} -> {new.get('vtk_version')}")
+    for script, result in new["examples"].items():
+        before = old["examples"].get(script)
+        if before is None:
+            continue
+        if before["status"] == "ok" and result["status"] != "ok":
+            regressions.append(script)
+            print(f"  {script}: {result['status']} ({result.get('error')})")
+            continue
+        if before["status"] != "ok" or result["status"] != "ok":
+            continue
+        changes = []
+        for metric in METRICS:
+            a, b = before.get(metric), result.get(metric)
+            if a is None or b is None:
+                continue
+            if b - a > MIN_DIFFERENCE[metric] and b > a * (1 + threshold):
+                changes.append(f"{metric} {a:.3g} -> {b:.3g}")
+        if changes:
+            regressions.append(script)
+            print(f"  {script}: " + ", ".join(changes))
+    if not regressions:
+        print("  no regressions")
+    return regressions
+
+
+def _format(value, unit):
+    return "-" if value is None else f"{value:.2f}{unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("patterns", nargs="*",
+                        help="only run the scripts whose path contains one of these")
+    parser.add_argument("-o", "--output",
+                        default=os.path.join(tempfile.gettempdir(), "vtk_examples_report.json"),
+                        help="where to write the JSON report (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="runs per script; the best of each metric is kept")
+    parser.add_argument("--timeout", type=float, default=600,
+                        help="seconds before a script is stopped")
+    parser.add_argument("--compare", metavar="REPORT",
+                        help="an earlier report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative increase reported as a regression")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(*args.child)
+
+    report = {
+        "vtk_version": vtk_version(),
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "examples": {},
+    }
+    for script in find_examples(args.patterns):
+        results = [run_example(script, args.timeout) for _ in range(max(1, args.repeat))]
+        result = report["examples"][script] = _best(results)
+        if result["status"] == "ok":
+            print(f"{script:55} pipeline {_format(result['pipeline_s'], ' s'):>8}  "
+                  f"render {_format(result['first_render_s'], ' s'):>8}  "
+                  f"peak {_format(result['peak_rss_mb'], ' MB'):>10}")
+        else:
+            print(f"{script:55} {result['status']}: {result.get('error')}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(json.load(f), report, args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,93 @@
 import vtk
 from imgui_bundle import imgui, immapp, hello_imgui
 
+# OpenGL enums for glBlitFramebuffer, which VTK does not wrap
+GL_COLOR_BUFFER_BIT = 0x4000
+GL_NEAREST = 0x2600
+
+class RenderTargetManager:
+    """Two offscreen render targets that ImGui draws the VTK frames from.
+
+    VTK renders into the render window's own framebuffers. Each finished
+    frame is copied on the GPU into the back target, which then becomes
+    the front one, so ImGui always draws a completed frame from a texture
+    whose handle only changes when the viewport is resized.
+
+    A new frame is only rendered when the viewport size changed or when
+    something in the scene is newer than the front target: the window,
+    a renderer, its camera, or a prop together with its mapper and input
+    (vtkProp.GetRedrawMTime()). Otherwise the front texture is reused, so
+    an idle viewport costs nothing per UI frame.
+    """
+
+    def __init__(self, render_window):
+        self.render_window = render_window
+        self.targets = [vtk.vtkOpenGLFramebufferObject(),
+                        vtk.vtkOpenGLFramebufferObject()]
+        self.handles = [None, None]
+        self.size = None
+        self.front = None
+        self.front_mtime = 0
+        self.frames_rendered = 0
+        self.frames_reused = 0
+
+    def scene_mtime(self):
+        mtime = self.render_window.GetMTime()
+        for renderer in self.render_window.GetRenderers():
+            mtime = max(mtime, renderer.GetMTime(), renderer.GetActiveCamera().GetMTime())
+            props = renderer.GetViewProps()
+            for i in range(props.GetNumberOfItems()):
+                mtime = max(mtime, props.GetItemAsObject(i).GetRedrawMTime())
+        return mtime
+
+    def resize(self, width, height):
+        """Reallocates the window and both targets for a new viewport size."""
+        self.render_window.SetSize(width, height)
+        for i, target in enumerate(self.targets):
+            if self.size is None:
+                target.SetContext(self.render_window)
+                target.PopulateFramebuffer(width, height)
+            else:
+                target.Resize(width, height)
+            self.handles[i] = target.GetColorAttachmentAsTextureObject(0).GetHandle()
+        self.size = (width, height)
+        self.front = None
+
+    def texture(self, width, height):
+        """Returns the OpenGL handle of the texture with the latest frame."""
+        if width <= 0 or height <= 0:
+            return None
+        if (width, height) != self.size:
+            self.resize(width, height)
+        if self.front is None or self.scene_mtime() > self.front_mtime:
+            self.render()
+        else:
+            self.frames_reused += 1
+        return self.handles[self.front]
+
+    def render(self):
+        self.render_window.Render()
+        back = 1 if self.front == 0 else 0
+        width, height = self.size
+        extent = [0, width, 0, height]
+
+        # Copy the resolved frame into the back target, leaving the
+        # framebuffer bindings as ImGui expects them.
+        state = self.render_window.GetState()
+        state.PushFramebufferBindings()
+        display = self.render_window.GetDisplayFramebuffer()
+        display.Bind(vtk.vtkOpenGLFramebufferObject.GetReadMode())
+        display.ActivateReadBuffer(0)
+        self.targets[back].Bind(vtk.vtkOpenGLFramebufferObject.GetDrawMode())
+        self.targets[back].ActivateDrawBuffer(0)
+        vtk.vtkOpenGLFramebufferObject.Blit(extent, extent, GL_COLOR_BUFFER_BIT, GL_NEAREST)
+        state.PopFramebufferBindings()
+
+        self.front = back
+        # Read after rendering, which itself touches the camera clipping range.
+        self.front_mtime = self.scene_mtime()
+        self.frames_rendered += 1
+
 class VtkImGuiRenderer:
     def __init__(self):
         self.renderer = vtk.vtkRenderer()
@@ -15,7 +102,10 @@ class VtkImGuiRenderer:
         # 2. Setup Interactor
         self.interactor = vtk.vtkGenericRenderWindowInteractor()
         self.interactor.SetRenderWindow(self.render_window)
-        
+        # The interactor style would render on every mouse move; leave all
+        # rendering to the render-target manager, which sees the camera change.
+        self.interactor.EnableRenderOff()
+
         # FORCE TRACKBALL INTERACTION
         style = vtk.vtkInteractorStyleTrackballCamera()
         self.interactor.SetInteractorStyle(style)
@@ -39,25 +129,16 @@ class VtkImGuiRenderer:
         # 4. State tracking for smooth interaction
         self.is_interacting = False
 
+        # 5. Double-buffered textures, only re-rendered when something changed
+        self.targets = RenderTargetManager(self.render_window)
+
     def init_vtk_context(self):
         self.render_window.SetMapped(True)
         self.render_window.SetIsCurrent(True)
         self.render_window.OpenGLInitContext()
 
     def render_frame(self, phys_width, phys_height):
-        if phys_width <= 0 or phys_height <= 0:
-            return None
-        
-        self.render_window.SetSize(int(phys_width), int(phys_height))
-        self.render_window.Render()
-        
-        fbo = self.render_window.GetRenderFramebuffer()
-        if fbo:
-            tex = fbo.GetColorAttachmentAsTextureObject(0)
-            if tex:
-                return tex.GetHandle()
-        
-        return None
+        return self.targets.texture(int(phys_width), int(phys_height))
 
     def handle_input(self, pos, logical_size):
         io = imgui.get_io()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+#
+# This example extends QtCone.py with a render scheduler. A grid of cones
+# is animated by a QTimer that updates every cone separately, and each
+# update asks the scheduler for a render instead of rendering. The
+# scheduler renders once per turn of the Qt event loop however many
+# renders were requested, lets interaction renders go before data-update
+# renders, and after a moment without requests makes one high-quality
+# "still" render. The status bar shows the requested and performed
+# render counts.
+#
+
+import sys
+
+# Use QOpenGLWidget as the base class for the VTK widget.  This must
+# be set before importing QVTKRenderWindowInteractor.
+import vtkmodules.qt
+vtkmodules.qt.QVTKRWIBase = "QOpenGLWidget"
+
+from PySide6.QtCore import QElapsedTimer, QObject, QTimer
+from PySide6.QtWidgets import QApplication, QMainWindow
+
+from vtkmodules.qt.QVTKRenderWindowInteractor import QVTKRenderWindowInteractor
+from vtkmodules.vtkFiltersSources import vtkConeSource
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderer,
+)
+
+# Ensure an OpenGL rendering backend and interactor style are loaded
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+import vtkmodules.vtkInteractionStyle  # noqa: F401
+
+
+class RenderScheduler(QObject):
+    """Renders a QVTKRenderWindowInteractor on demand.
+
+    Call request_render() instead of Render() after changing the scene.
+    Requests made during one turn of the Qt event loop are served by one
+    render at the end of it. The interactor no longer renders by itself:
+    its renders, requested by the interactor style and by paint events,
+    become interaction requests through its RenderEvent.
+
+    Interaction requests are served first. Data-update requests made
+    while the user interacts wait for the next interaction render, which
+    draws them anyway, and otherwise are rendered at most once every
+    data_interval milliseconds. After still_delay milliseconds without a
+    render, the quality callbacks are called with True and one more
+    "still" render is made; they are called with False before the next
+    render, so that they can switch the scene back to interactive quality.
+    """
+
+    def __init__(self, widget, data_interval=33, still_delay=300):
+        super().__init__(widget)
+        self.render_window = widget.GetRenderWindow()
+        self.interactor = widget.GetRenderWindow().GetInteractor()
+        self.data_interval = data_interval
+        self.quality_callbacks = []
+        self.counters = {"requested": 0, "interaction requests": 0,
+                         "data requests": 0, "performed": 0, "still": 0}
+        self.interacting = False
+        self.still = False
+        self.pending_interaction = False
+        self.pending_data = False
+        self.flush_scheduled = False
+
+        self.since_render = QElapsedTimer()
+        self.since_render.start()
+        self.still_timer = QTimer(self)
+        self.still_timer.setSingleShot(True)
+        self.still_timer.setInterval(still_delay)
+        self.still_timer.timeout.connect(self.render_still)
+
+        # Turn the interactor's own renders into requests.
+        self.interactor.EnableRenderOff()
+        self.interactor.AddObserver("RenderEvent", self._interaction_render)
+        self.interactor.AddObserver("StartInteractionEvent", self._start_interaction)
+        self.interactor.AddObserver("EndInteractionEvent", self._end_interaction)
+
+    def add_quality_callback(self, callback):
+        self.quality_callbacks.append(callback)
+
+    def request_render(self, interactive=False):
+        self.counters["requested"] += 1
+        if interactive:
+            self.counters["interaction requests"] += 1
+            self.pending_interaction = True
+        else:
+            self.counters["data requests"] += 1
+            self.pending_data = True
+        self._schedule(0)
+
+    def _interaction_render(self, obj, event):
+        self.request_render(interactive=True)
+
+    def _start_interaction(self, obj, event):
+        self.interacting = True
+
+    def _end_interaction(self, obj, event):
+        self.interacting = False
+        # Render the data updates that waited for the interaction.
+        if self.pending_data:
+            self._schedule(0)
+
+    def _schedule(self, delay):
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            QTimer.singleShot(delay, self._flush)
+
+    def _flush(self):
+        self.flush_scheduled = False
+        if self.pending_interaction:
+            self._render(self.interactor.GetDesiredUpdateRate())
+        elif self.pending_data and not self.interacting:
+            wait = self.data_interval - self.since_render.elapsed()
+            if wait > 0:
+                self._schedule(wait)
+            else:
+                self._render(self.interactor.GetStillUpdateRate())
+
+    def _render(self, update_rate):
+        if self.still:
+            self.still = False
+            for callback in self.quality_callbacks:
+                callback(False)
+        self.pending_interaction = self.pending_data = False
+        self.render_window.SetDesiredUpdateRate(update_rate)
+        self.render_window.Render()
+        self.counters["performed"] += 1
+        self.since_render.restart()
+        self.still_timer.start()
+
+    def render_still(self):
+        if self.interacting:
+            self.still_timer.start()
+            return
+        self.still = True
+        for callback in self.quality_callbacks:
+            callback(True)
+        self.render_window.SetDesiredUpdateRate(self.interactor.GetStillUpdateRate())
+        self.render_window.Render()
+        self.counters["performed"] += 1
+        self.counters["still"] += 1
+
+
+app = QApplication(sys.argv)
+window = QMainWindow()
+window.setWindowTitle("VTK Qt Render Scheduler Example")
+window.resize(800, 600)
+
+# Create the VTK widget and place it in the main window.
+vtk_widget = QVTKRenderWindowInteractor(window)
+window.setCentralWidget(vtk_widget)
+
+renderer = vtkRenderer()
+renderer.SetBackground(0.1, 0.2, 0.4)
+vtk_widget.GetRenderWindow().AddRenderer(renderer)
+
+# A 5 x 5 grid of cones, each with its own pipeline.
+cones = []
+for i in range(25):
+    cone = vtkConeSource()
+    cone.SetHeight(3.0)
+    cone.SetRadius(1.0)
+    cone.SetResolution(8)
+    mapper = vtkPolyDataMapper()
+    mapper.SetInputConnection(cone.GetOutputPort())
+    actor = vtkActor()
+    actor.SetMapper(mapper)
+    actor.SetPosition(4 * (i % 5), 4 * (i // 5), 0)
+    renderer.AddActor(actor)
+    cones.append((cone, actor))
+renderer.ResetCamera()
+
+scheduler = RenderScheduler(vtk_widget)
+
+
+def set_quality(still):
+    # Smooth cones and anti-aliasing only for the still render.
+    for cone, _ in cones:
+        cone.SetResolution(64 if still else 8)
+    renderer.SetUseFXAA(still)
+
+
+scheduler.add_quality_callback(set_quality)
+
+# Spin the cones for a few seconds, one request per updated actor.
+frame = 0
+
+
+def animate():
+    global frame
+    frame += 1
+    for i, (_, actor) in enumerate(cones):
+        actor.RotateX(2 + i % 3)
+        scheduler.request_render()
+    if frame == 180:
+        animation.stop()
+
+
+animation = QTimer()
+animation.timeout.connect(animate)
+animation.start(16)
+
+
+def show_counters():
+    window.statusBar().showMessage(
+        ", ".join(f"{name}: {count}" for name, count in scheduler.counters.items()))
+
+
+status = QTimer()
+status.timeout.connect(show_counters)
+status.start(250)
+
+window.show()
+vtk_widget.Initialize()
+vtk_widget.Start()
+
+sys.exit(app.exec())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+#
+# This example turns the cone of Cone2.py through 360 degrees at a fixed
+# frame rate. Instead of sleeping a fixed time between renders, the
+# FrameRateGovernor schedules each frame on a clock, measures how long
+# the render took with observers on the render window's StartEvent and
+# EndEvent, and when rendering falls behind it drops the late frames and
+# applies their camera updates in one step. The turntable therefore takes
+# the same time on any hardware; slower machines show fewer frames.
+#
+
+import math
+import time
+
+from vtkmodules.vtkFiltersSources import vtkConeSource
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderer,
+    vtkRenderWindow,
+)
+
+# Ensure an OpenGL rendering backend is loaded
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+
+
+class FrameRateGovernor:
+    """Renders an animation at a target frame rate and times every frame.
+
+    Frame i is due at i / target_fps seconds after the start. After each
+    render the governor sleeps until the next frame is due. If that frame
+    is already late, it and any other late frames are dropped, and the
+    steps they would have made are passed to advance() together.
+    """
+
+    def __init__(self, render_window, target_fps=30.0):
+        self._render_window = render_window
+        self._period = 1.0 / target_fps
+        self._render_times = []
+        self._dropped = 0
+        self._elapsed = 0.0
+        self._render_start = None
+        render_window.AddObserver("StartEvent", self._start_render)
+        render_window.AddObserver("EndEvent", self._end_render)
+
+    def _start_render(self, obj, event):
+        self._render_start = time.perf_counter()
+
+    def _end_render(self, obj, event):
+        self._render_times.append(time.perf_counter() - self._render_start)
+
+    def run(self, advance, frames):
+        """Renders the given number of frames, calling advance(steps) between them."""
+        self._render_times.clear()
+        self._dropped = 0
+        start = time.perf_counter()
+        frame = 0
+        while frame < frames:
+            self._render_window.Render()
+            # The first frame that is not late yet.
+            due = math.floor((time.perf_counter() - start) / self._period) + 1
+            next_frame = min(max(frame + 1, due), frames)
+            self._dropped += next_frame - frame - 1
+            if next_frame < frames:
+                advance(next_frame - frame)
+                delay = start + next_frame * self._period - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            frame = next_frame
+        self._elapsed = time.perf_counter() - start
+
+    def get_statistics(self):
+        """Returns the render time statistics of the last run, in seconds."""
+        times = sorted(self._render_times)
+        if not times:
+            return None
+        return {
+            "frames": len(times),
+            "dropped": self._dropped,
+            "fps": len(times) / self._elapsed,
+            "min": times[0],
+            "mean": sum(times) / len(times),
+            "p99": times[max(0, math.ceil(0.99 * len(times)) - 1)],
+            "max": times[-1],
+        }
+
+
+# Create the pipeline
+cone = vtkConeSource()
+cone.SetHeight(3.0)
+cone.SetRadius(1.0)
+cone.SetResolution(10)
+
+cone_mapper = vtkPolyDataMapper()
+cone_mapper.SetInputConnection(cone.GetOutputPort())
+
+cone_actor = vtkActor()
+cone_actor.SetMapper(cone_mapper)
+
+renderer = vtkRenderer()
+renderer.AddActor(cone_actor)
+renderer.SetBackground(0.1, 0.2, 0.4)
+
+render_window = vtkRenderWindow()
+render_window.AddRenderer(renderer)
+render_window.SetSize(800, 800)
+
+# One degree per frame at 30 frames per second: a 12 second turntable.
+camera = renderer.GetActiveCamera()
+governor = FrameRateGovernor(render_window, target_fps=30.0)
+governor.run(lambda steps: camera.Azimuth(steps), frames=360)
+
+stats = governor.get_statistics()
+print(f"{stats['frames']} frames rendered, {stats['dropped']} dropped, "
+      f"{stats['fps']:.1f} frames per second")
+print(f"Render time: min {1000 * stats['min']:.2f} ms, mean {1000 * stats['mean']:.2f} ms, "
+      f"p99 {1000 * stats['p99']:.2f} ms")
@@ -0,0 +1,334 @@
+"""Delta-compressed image streaming of a server-side render window.
+
+VtkRemoteView in TrameCone.py sends a complete encoded image for every
+frame. TileStreamer splits each frame of the same render window into
+tiles, compares them with the previous frame and encodes only the tiles
+that changed, merged into rectangles, with a choice of codec and
+quality. While the user interacts it renders at a reduced resolution and
+lower quality, and when the interaction ends it sends one
+full-resolution, full-quality frame.
+
+The script streams a turntable of the TrameCone.py cone to a client over
+a loopback socket with each codec. It reports the bandwidth, compared
+with sending each frame whole, and the latency from the rendered frame
+to the decoded image at the client.
+"""
+
+import socket
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkFiltersSources import vtkConeSource
+from vtkmodules.vtkIOImage import (
+    vtkJPEGReader,
+    vtkJPEGWriter,
+    vtkPNGReader,
+    vtkPNGWriter,
+)
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderer,
+    vtkRenderWindow,
+    vtkWindowToImageFilter,
+)
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+
+CODECS = {"zlib": 0, "png": 1, "jpeg": 2}
+
+# Frame: id, width, height, rectangle count, codec
+# Rectangle: x, y, width, height, encoded size
+FRAME_HEADER = struct.Struct("<IHHHB")
+TILE_HEADER = struct.Struct("<HHHHI")
+
+
+def encode_tile(pixels, codec, quality):
+    """Encodes an (height, width, 3) uint8 tile."""
+    if codec == "zlib":
+        return zlib.compress(pixels.tobytes(), 1)
+    image = vtkImageData()
+    image.SetDimensions(pixels.shape[1], pixels.shape[0], 1)
+    image.GetPointData().SetScalars(numpy_to_vtk(pixels.reshape(-1, 3)))
+    if codec == "png":
+        writer = vtkPNGWriter()
+        writer.SetCompressionLevel(1)
+    else:
+        writer = vtkJPEGWriter()
+        writer.SetQuality(quality)
+    writer.SetInputData(image)
+    writer.WriteToMemoryOn()
+    writer.Write()
+    return bytes(vtk_to_numpy(writer.GetResult()))
+
+
+def decode_tile(data, codec, width, height):
+    if codec == "zlib":
+        return np.frombuffer(zlib.decompress(data), np.uint8).reshape(height, width, 3)
+    reader = vtkPNGReader() if codec == "png" else vtkJPEGReader()
+    if hasattr(reader, "SetStream"):
+        from vtkmodules.vtkIOCore import vtkMemoryResourceStream
+
+        stream = vtkMemoryResourceStream()
+        stream.SetBuffer(data, len(data), True)
+        reader.SetStream(stream)
+    else:
+        reader.SetMemoryBuffer(data)
+        reader.SetMemoryBufferLength(len(data))
+    reader.Update()
+    pixels = vtk_to_numpy(reader.GetOutput().GetPointData().GetScalars())
+    return pixels.reshape(height, width, -1)[:, :, :3]
+
+
+def _runs(row):
+    """Returns the (start, stop) of each run of True values."""
+    edges = np.flatnonzero(np.diff(np.concatenate([[False], row, [False]])))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+class TileStreamer:
+    """Turns the frames of a render window into tile update messages.
+
+    Each message holds the tiles of the window that differ from the
+    previous frame, so a client that applies the messages in order keeps
+    a copy of the window. Neighbouring changed tiles are merged into
+    rectangles, each encoded as one image, which saves the per-image
+    overhead of the codec. A frame whose size differs from the previous
+    one (at the start, and when the interaction starts or ends) is sent
+    whole. Pixels are compared before encoding, so a lossy codec only
+    changes how the tiles that are sent look.
+    """
+
+    def __init__(self, render_window, tile_size=64, codec="jpeg", quality=85,
+                 interactive_scale=0.5, interactive_quality=50):
+        if codec not in CODECS:
+            raise ValueError(f"codec must be one of {sorted(CODECS)}")
+        self.render_window = render_window
+        self.tile_size = tile_size
+        self.codec = codec
+        self.quality = quality
+        self.interactive_scale = interactive_scale
+        self.interactive_quality = interactive_quality
+        self.interacting = False
+        self.full_size = tuple(render_window.GetSize())
+        self.frame_id = 0
+        self.previous = None
+        self.changed = 0
+        self.capture = vtkWindowToImageFilter()
+        self.capture.SetInput(render_window)
+        self.capture.ReadFrontBufferOff()
+
+    def watch(self, interactor):
+        """Follows the interaction of a vtkRenderWindowInteractor."""
+        interactor.AddObserver("StartInteractionEvent", lambda obj, event: self.start_interaction())
+        interactor.AddObserver("EndInteractionEvent", lambda obj, event: self.end_interaction())
+
+    def start_interaction(self):
+        self.interacting = True
+        self.full_size = tuple(self.render_window.GetSize())
+        width, height = (max(1, int(n * self.interactive_scale)) for n in self.full_size)
+        self.render_window.SetSize(width, height)
+
+    def end_interaction(self):
+        self.interacting = False
+        self.render_window.SetSize(*self.full_size)
+
+    def grab(self):
+        """Renders the window and returns its pixels, top row first."""
+        self.render_window.Render()
+        self.capture.Modified()
+        self.capture.Update()
+        image = self.capture.GetOutput()
+        width, height, _ = image.GetDimensions()
+        pixels = vtk_to_numpy(image.GetPointData().GetScalars())
+        return pixels.reshape(height, width, -1)[::-1, :, :3]
+
+    def changed_tiles(self, frame):
+        """Returns a (rows, columns) mask of the tiles that differ from the last frame."""
+        height, width, _ = frame.shape
+        n = self.tile_size
+        rows, columns = -(-height // n), -(-width // n)
+        if self.previous is None or self.previous.shape != frame.shape:
+            return np.ones((rows, columns), dtype=bool)
+        changed = np.zeros((rows * n, columns * n), dtype=bool)
+        changed[:height, :width] = (frame != self.previous).any(axis=2)
+        return changed.reshape(rows, n, columns, n).any(axis=(1, 3))
+
+    def changed_rectangles(self, frame):
+        """Returns the changed tiles merged into (x, y, width, height) rectangles.
+
+        Runs of changed tiles in a row of tiles become one rectangle, and
+        the same run in consecutive rows extends it downwards.
+        """
+        tiles = self.changed_tiles(frame)
+        self.changed = int(tiles.sum())
+        height, width, _ = frame.shape
+        n = self.tile_size
+        rectangles = []
+        open_runs = {}
+        for row in range(tiles.shape[0] + 1):
+            runs = set(_runs(tiles[row])) if row < tiles.shape[0] else set()
+            for run in [run for run in open_runs if run not in runs]:
+                (start, stop), first = run, open_runs.pop(run)
+                x, y = start * n, first * n
+                rectangles.append((x, y, min(stop * n, width) - x, min(row * n, height) - y))
+            for run in runs:
+                open_runs.setdefault(run, row)
+        return rectangles
+
+    def next_message(self, frame=None):
+        """Returns the message that brings a client up to the current frame."""
+        if frame is None:
+            frame = self.grab()
+        height, width, _ = frame.shape
+        quality = self.interactive_quality if self.interacting else self.quality
+        parts = []
+        rectangles = self.changed_rectangles(frame)
+        for x, y, w, h in rectangles:
+            data = encode_tile(np.ascontiguousarray(frame[y:y + h, x:x + w]),
+                               self.codec, quality)
+            parts.append(TILE_HEADER.pack(x, y, w, h, len(data)))
+            parts.append(data)
+        self.previous = frame
+        self.frame_id += 1
+        header = FRAME_HEADER.pack(self.frame_id, width, height, len(rectangles),
+                                   CODECS[self.codec])
+        return header + b"".join(parts)
+
+
+class TileClient:
+    """Applies tile messages to its own copy of the streamed window."""
+
+    def __init__(self):
+        self.frame = None
+        self.frame_id = 0
+
+    def apply(self, message):
+        frame_id, width, height, count, codec_id = FRAME_HEADER.unpack_from(message)
+        codec = next(name for name, value in CODECS.items() if value == codec_id)
+        if self.frame is None or self.frame.shape[:2] != (height, width):
+            self.frame = np.zeros((height, width, 3), np.uint8)
+        offset = FRAME_HEADER.size
+        for _ in range(count):
+            x, y, w, h, length = TILE_HEADER.unpack_from(message, offset)
+            offset += TILE_HEADER.size
+            data = message[offset:offset + length]
+            offset += length
+            self.frame[y:y + h, x:x + w] = decode_tile(data, codec, w, h)
+        self.frame_id = frame_id
+
+
+def send_message(connection, message):
+    connection.sendall(struct.pack("<I", len(message)) + message)
+
+
+def receive_exactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("stream closed")
+        data += chunk
+    return bytes(data)
+
+
+def stream_turntable(streamer, camera, frames, interactive_frames):
+    """Streams a turntable over loopback and returns the per-frame results.
+
+    The latency runs from the rendered frame to the decoded image at the
+    client, and includes encoding, sending and decoding.
+
+    The camera turns one degree per frame. The first interactive_frames
+    frames are streamed as an interaction, then one still frame follows,
+    then idle frames where nothing moves.
+    """
+    listener = socket.create_server(("127.0.0.1", 0))
+    client = TileClient()
+    received = []
+
+    def receive():
+        connection, _ = listener.accept()
+        with connection:
+            while True:
+                size = struct.unpack("<I", receive_exactly(connection, 4))[0]
+                if size == 0:
+                    return
+                client.apply(receive_exactly(connection, size))
+                received.append(time.perf_counter())
+
+    thread = threading.Thread(target=receive)
+    thread.start()
+    results = []
+    with socket.create_connection(listener.getsockname()) as connection:
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        for i in range(frames):
+            if i == 0:
+                streamer.start_interaction()
+            elif i == interactive_frames:
+                streamer.end_interaction()
+            elif i < interactive_frames:
+                camera.Azimuth(1)
+            start = time.perf_counter()
+            frame = streamer.grab()
+            rendered = time.perf_counter()
+            message = streamer.next_message(frame)
+            send_message(connection, message)
+            while len(received) <= i:
+                time.sleep(0.0001)
+            results.append({"bytes": len(message), "render": rendered - start,
+                            "latency": received[i] - rendered, "tiles": streamer.changed,
+                            "full": full_frame_bytes(streamer, frame)})
+        send_message(connection, b"")
+    thread.join()
+    listener.close()
+    return results, client.frame, streamer.previous
+
+
+def full_frame_bytes(streamer, frame):
+    """The size of the frame sent whole with the same codec and quality."""
+    quality = streamer.interactive_quality if streamer.interacting else streamer.quality
+    return len(encode_tile(np.ascontiguousarray(frame), streamer.codec, quality))
+
+
+# The TrameCone.py scene, rendered offscreen as a remote view would
+renderer = vtkRenderer()
+render_window = vtkRenderWindow()
+render_window.AddRenderer(renderer)
+render_window.SetSize(800, 600)
+render_window.OffScreenRenderingOn()
+
+cone = vtkConeSource()
+cone.SetResolution(30)
+mapper = vtkPolyDataMapper()
+mapper.SetInputConnection(cone.GetOutputPort())
+actor = vtkActor()
+actor.SetMapper(mapper)
+renderer.AddActor(actor)
+renderer.ResetCamera()
+renderer.GetActiveCamera().Zoom(0.6)
+
+for codec in ["zlib", "png", "jpeg"]:
+    renderer.ResetCamera()
+    renderer.GetActiveCamera().Zoom(0.6)
+    streamer = TileStreamer(render_window, codec=codec)
+    results, received, sent = stream_turntable(streamer, renderer.GetActiveCamera(),
+                                               frames=40, interactive_frames=30)
+    phases = {"interaction": results[:30], "final frame": results[30:31],
+              "idle": results[31:]}
+    print(f"{codec}:")
+    for name, phase in phases.items():
+        sent_bytes = sum(r["bytes"] for r in phase) / len(phase)
+        full_bytes = sum(r["full"] for r in phase) / len(phase)
+        render = sorted(r["render"] for r in phase)[len(phase) // 2]
+        latency = sorted(r["latency"] for r in phase)[len(phase) // 2]
+        tiles = sum(r["tiles"] for r in phase) / len(phase)
+        print(f"  {name:12} {tiles:6.1f} tiles, {sent_bytes / 1024:6.1f} KiB per frame "
+              f"({full_bytes / 1024:6.1f} KiB whole); median render {1000 * render:5.1f} ms, "
+              f"latency {1000 * latency:5.1f} ms")
+    error = np.abs(received.astype(int) - sent.astype(int)).max()
+    print(f"  largest pixel difference at the client: {error}")
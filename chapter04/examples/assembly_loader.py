@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+#
+# This example loads a CAD assembly with many repeated parts. Like
+# Assembly.py it builds a vtkAssembly hierarchy, but the parts are read
+# from files listed in a nested description. AssemblyLoader reads every
+# file only once, on a pool of threads, and gives instances with identical
+# geometry one shared mapper, so the load time and the graphics memory
+# grow with the number of distinct parts rather than with the number of
+# instances. Each instance is an actor of its own with its own transform.
+#
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from vtkmodules.util.numpy_support import vtk_to_numpy
+from vtkmodules.vtkFiltersSources import vtkCubeSource, vtkCylinderSource
+from vtkmodules.vtkIOGeometry import vtkOBJReader, vtkSTLReader, vtkSTLWriter
+from vtkmodules.vtkIOLegacy import vtkPolyDataReader
+from vtkmodules.vtkIOPLY import vtkPLYReader
+from vtkmodules.vtkIOXML import vtkXMLPolyDataReader
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkAssembly,
+    vtkPolyDataMapper,
+    vtkProperty,
+    vtkRenderer,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+)
+
+# Ensure an OpenGL rendering backend is loaded
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+import vtkmodules.vtkInteractionStyle  # noqa: F401
+
+READERS = {
+    ".stl": vtkSTLReader,
+    ".vtp": vtkXMLPolyDataReader,
+    ".ply": vtkPLYReader,
+    ".obj": vtkOBJReader,
+    ".vtk": vtkPolyDataReader,
+}
+
+
+def file_digest(file_name):
+    """Returns a digest of the bytes of a file."""
+    digest = hashlib.blake2b()
+    with open(file_name, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def geometry_digest(polydata):
+    """Returns a digest of the points, cells and point and cell data of polydata."""
+    digest = hashlib.blake2b()
+    arrays = [polydata.GetPoints().GetData()] if polydata.GetPoints() else []
+    for cells in (polydata.GetVerts(), polydata.GetLines(),
+                  polydata.GetPolys(), polydata.GetStrips()):
+        arrays += [cells.GetOffsetsArray(), cells.GetConnectivityArray()]
+    for label, data in (("point", polydata.GetPointData()), ("cell", polydata.GetCellData())):
+        # The label keeps a point array from matching a cell array.
+        digest.update(f"{label} data {data.GetNumberOfArrays()};".encode())
+        arrays += [data.GetArray(i) for i in range(data.GetNumberOfArrays())]
+    for array in arrays:
+        if array is not None:
+            digest.update(f"{array.GetName()}:{array.GetDataTypeAsString()}:"
+                          f"{array.GetNumberOfComponents()};".encode())
+            digest.update(vtk_to_numpy(array).tobytes())
+    return digest.hexdigest()
+
+
+def read_part(file_name):
+    """Reads a part file with the reader for its extension."""
+    reader = READERS[os.path.splitext(file_name)[1].lower()]()
+    reader.SetFileName(file_name)
+    reader.Update()
+    return reader.GetOutput()
+
+
+class AssemblyLoader:
+    """Builds a vtkAssembly from a nested description of parts.
+
+    A node of the description is a dict. A part has a "file"; any other
+    node has a list of "children" and becomes a sub-assembly. Every node
+    may have a "position", "orientation" (in degrees, as for
+    vtkProp3D.SetOrientation), "scale" and "origin", and parts may have a
+    "color". The same file may appear any number of times.
+
+    load() reads each distinct file once on a pool of threads and compares
+    the geometry that comes out of them. The reads only overlap if VTK
+    releases the GIL inside the readers, which the wrappers do when VTK is
+    built with VTK_PYTHON_FULL_THREADSAFE. Files with the same geometry, even with different bytes, share
+    one polydata and one mapper, so the geometry is uploaded to the
+    graphics card once; parts of the same color share one property.
+    """
+
+    def __init__(self, number_of_threads=None):
+        self.number_of_threads = number_of_threads or os.cpu_count() or 1
+        self.statistics = {}
+
+    def load(self, description):
+        start = time.perf_counter()
+        parts = []
+        self._collect(description, parts)
+        files = sorted({os.path.abspath(part["file"]) for part in parts})
+
+        with ThreadPoolExecutor(self.number_of_threads) as pool:
+            digests = dict(zip(files, pool.map(file_digest, files)))
+            # The first file with given contents stands for all of them.
+            distinct = {}
+            for file_name in files:
+                distinct.setdefault(digests[file_name], file_name)
+            geometry = dict(zip(distinct, pool.map(read_part, distinct.values())))
+            shapes = dict(zip(distinct, pool.map(geometry_digest, geometry.values())))
+
+        mappers = {}
+        self._mappers = {}
+        for digest, polydata in geometry.items():
+            if shapes[digest] not in mappers:
+                mapper = vtkPolyDataMapper()
+                mapper.SetInputData(polydata)
+                # The geometry never changes, so skip the pipeline checks
+                # each render would otherwise make for every instance.
+                mapper.StaticOn()
+                mappers[shapes[digest]] = mapper
+            self._mappers[digest] = mappers[shapes[digest]]
+        self._digests = digests
+        self._properties = {}
+
+        root = self._build(description)
+        if not isinstance(root, vtkAssembly):
+            assembly = vtkAssembly()
+            assembly.AddPart(root)
+            root = assembly
+        self.statistics = {
+            "instances": len(parts),
+            "files": len(files),
+            "distinct files": len(distinct),
+            "distinct geometries": len(mappers),
+            "points uploaded": sum(m.GetInput().GetNumberOfPoints()
+                                   for m in mappers.values()),
+            "seconds": time.perf_counter() - start,
+        }
+        return root
+
+    def _collect(self, node, parts):
+        if "file" in node:
+            parts.append(node)
+        for child in node.get("children", ()):
+            self._collect(child, parts)
+
+    def _build(self, node):
+        if "file" in node:
+            prop = vtkActor()
+            prop.SetMapper(self._mappers[self._digests[os.path.abspath(node["file"])]])
+            color = tuple(node.get("color", (1.0, 1.0, 1.0)))
+            if color not in self._properties:
+                self._properties[color] = vtkProperty()
+                self._properties[color].SetColor(*color)
+            prop.SetProperty(self._properties[color])
+        else:
+            prop = vtkAssembly()
+            for child in node.get("children", ()):
+                prop.AddPart(self._build(child))
+        place(prop, node)
+        return prop
+
+
+def place(prop, node):
+    """Applies the origin, scale, orientation and position of a node to prop."""
+    if "origin" in node:
+        prop.SetOrigin(*node["origin"])
+    if "scale" in node:
+        scale = node["scale"]
+        prop.SetScale(*(scale if isinstance(scale, (list, tuple)) else (scale,) * 3))
+    if "orientation" in node:
+        prop.SetOrientation(*node["orientation"])
+    if "position" in node:
+        prop.SetPosition(*node["position"])
+
+
+def load_naively(description):
+    """Builds the same assembly with one reader, mapper and property per instance."""
+    if "file" in description:
+        mapper = vtkPolyDataMapper()
+        mapper.SetInputData(read_part(description["file"]))
+        prop = vtkActor()
+        prop.SetMapper(mapper)
+        prop.GetProperty().SetColor(*description.get("color", (1.0, 1.0, 1.0)))
+    else:
+        prop = vtkAssembly()
+        for child in description.get("children", ()):
+            prop.AddPart(load_naively(child))
+    place(prop, description)
+    return prop
+
+
+def write_part(source, file_name, header):
+    writer = vtkSTLWriter()
+    writer.SetInputConnection(source.GetOutputPort())
+    writer.SetFileTypeToBinary()
+    writer.SetHeader(header)
+    writer.SetFileName(file_name)
+    writer.Write()
+
+
+# Part files: a plate, a bolt that is also saved under a second name, and
+# a nut saved twice by different tools (the STL headers differ, the
+# geometry does not). The CAD part of CADPart.py is used as a bracket.
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+parts_dir = tempfile.mkdtemp(prefix="vtk_parts_")
+plate = vtkCubeSource()
+plate.SetXLength(60)
+plate.SetYLength(1)
+plate.SetZLength(60)
+write_part(plate, os.path.join(parts_dir, "plate.stl"), "plate")
+bolt = vtkCylinderSource()
+bolt.SetRadius(0.8)
+bolt.SetHeight(6)
+bolt.SetResolution(48)
+write_part(bolt, os.path.join(parts_dir, "bolt.stl"), "bolt")
+shutil.copy(os.path.join(parts_dir, "bolt.stl"), os.path.join(parts_dir, "bolt_m8.stl"))
+nut = vtkCylinderSource()
+nut.SetRadius(1.5)
+nut.SetHeight(1.2)
+nut.SetResolution(6)
+write_part(nut, os.path.join(parts_dir, "nut.stl"), "nut, exported by tool A")
+write_part(nut, os.path.join(parts_dir, "nut_iso.stl"), "nut, exported by tool B")
+
+# A plate with a 20 x 20 grid of bolted joints and a bracket per corner.
+joints = []
+for i in range(20):
+    for j in range(20):
+        joints.append({
+            "position": (-28.5 + 3 * i, 0, -28.5 + 3 * j),
+            "children": [
+                {"file": os.path.join(parts_dir, "bolt.stl" if i % 2 else "bolt_m8.stl"),
+                 "position": (0, 1.5, 0), "color": (0.7, 0.7, 0.75)},
+                {"file": os.path.join(parts_dir, "nut.stl" if j % 2 else "nut_iso.stl"),
+                 "position": (0, 3.8, 0), "orientation": (0, 15 * (i + j), 0),
+                 "color": (0.8, 0.65, 0.3)},
+            ],
+        })
+# The bracket is modelled away from its own origin, so it is turned about
+# its center and moved so that the center lands at the corner.
+center = (128.4, 86.5, 223.5)
+brackets = [{"file": os.path.join(data_dir, "42400-IDGH.stl"),
+             "origin": center, "orientation": (-90, 0, 0),
+             "position": (x - center[0], 3.5 - center[1], z - center[2]),
+             "color": (0.3, 0.5, 0.8)}
+            for x in (-22, 22) for z in (-22, 22)]
+description = {
+    "orientation": (20, 30, 0),
+    "children": [
+        {"file": os.path.join(parts_dir, "plate.stl"), "color": (0.5, 0.5, 0.5)},
+        {"children": joints},
+        {"children": brackets},
+    ],
+}
+
+start = time.perf_counter()
+load_naively(description)
+print(f"One reader and mapper per instance: {time.perf_counter() - start:.2f} s")
+
+loader = AssemblyLoader()
+assembly = loader.load(description)
+print(f"AssemblyLoader with {loader.number_of_threads} threads: "
+      f"{loader.statistics['seconds']:.2f} s")
+for name, value in loader.statistics.items():
+    if name != "seconds":
+        print(f"  {name}: {value}")
+shutil.rmtree(parts_dir)
+
+renderer = vtkRenderer()
+renderer.AddActor(assembly)
+renderer.SetBackground(0.1, 0.2, 0.4)
+render_window = vtkRenderWindow()
+render_window.AddRenderer(renderer)
+render_window.SetSize(800, 800)
+interactor = vtkRenderWindowInteractor()
+interactor.SetRenderWindow(render_window)
+
+interactor.Initialize()
+renderer.ResetCamera()
+renderer.GetActiveCamera().Zoom(1.5)
+render_window.Render()
+
+if "--non-interactive" not in sys.argv:
+    interactor.Start()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+#
+# This example reads the part of CADPart.py with a binary STL reader
+# written with NumPy. vtkSTLReader merges the corners of the triangles
+# into shared points by inserting them one at a time into a point
+# locator. FastSTLReader reads the whole file as one structured array and
+# merges the corners by sorting them, so that the time is spent in a few
+# vectorized passes. The arrays it builds become the points and triangles
+# of the output without being copied again.
+#
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+from vtkmodules.util.vtkAlgorithm import VTKPythonAlgorithmBase
+from vtkmodules.vtkCommonCore import VTK_ID_TYPE, vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkCellArray, vtkPolyData
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+from vtkmodules.vtkIOGeometry import vtkSTLReader, vtkSTLWriter
+from vtkmodules.vtkRenderingCore import (
+    vtkPolyDataMapper,
+    vtkRenderer,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+)
+from vtkmodules.vtkRenderingLOD import vtkLODActor
+
+# Ensure an OpenGL rendering backend is loaded
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+import vtkmodules.vtkInteractionStyle  # noqa: F401
+
+# One binary STL facet: normal, three corners and an attribute word.
+FACET = np.dtype([("normal", "<f4", 3), ("corners", "<f4", (3, 3)),
+                  ("attribute", "<u2")])
+
+
+def merge_points(corners):
+    """Returns (points, ids) with ids[i] the index in points of corners[i].
+
+    Points are numbered in the order of their first use, as vtkSTLReader
+    numbers them, and corners merge only when all three coordinates are
+    equal. The corners are sorted by a 64-bit hash of their coordinates;
+    should two different corners have the same hash, they are sorted by
+    the coordinates themselves instead.
+    """
+    # Adding 0 turns -0.0 into 0.0, which compares equal to it.
+    x, y, z = (corners + np.float32(0)).T.copy().view(np.uint32)
+    keys = (x.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+            ^ y.astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+            ^ z.astype(np.uint64) * np.uint64(0x165667B19E3779F9))
+    order = np.argsort(keys)
+
+    def changes(order):
+        # True where the sorted corner differs from the one before it.
+        return np.logical_or.reduce(
+            [np.diff(column[order]) != 0 for column in (x, y, z)])
+
+    new_point = changes(order)
+    if np.any(new_point & (np.diff(keys[order]) == 0)):
+        order = np.lexsort((z, y, x))
+        new_point = changes(order)
+
+    # Each run of equal corners is one point, first used by its lowest index.
+    starts = np.flatnonzero(np.concatenate(([True], new_point)))
+    first = np.minimum.reduceat(order, starts)
+    by_first_use = np.argsort(first)
+    number = np.empty_like(by_first_use)
+    number[by_first_use] = np.arange(by_first_use.size)
+    ids = np.empty(corners.shape[0], dtype=np.int64)
+    ids[order] = np.repeat(number, np.diff(np.append(starts, order.size)))
+    return corners[first[by_first_use]], ids
+
+
+class FastSTLReader(VTKPythonAlgorithmBase):
+    """Reads binary STL files into vtkPolyData with NumPy.
+
+    The output matches vtkSTLReader: with merging on (the default) equal
+    corners share one point, numbered in order of first use, and
+    triangles that lose a corner in the merge are left out. ASCII files
+    are passed on to vtkSTLReader.
+    """
+
+    def __init__(self):
+        super().__init__(nInputPorts=0, nOutputPorts=1, outputType="vtkPolyData")
+        self._file_name = None
+        self._merging = True
+
+    def SetFileName(self, file_name):
+        if file_name != self._file_name:
+            self._file_name = file_name
+            self.Modified()
+
+    def GetFileName(self):
+        return self._file_name
+
+    def SetMerging(self, merging):
+        if bool(merging) != self._merging:
+            self._merging = bool(merging)
+            self.Modified()
+
+    def GetMerging(self):
+        return self._merging
+
+    def MergingOn(self):
+        self.SetMerging(True)
+
+    def MergingOff(self):
+        self.SetMerging(False)
+
+    def _facets(self):
+        """Returns the facets of a binary STL file, or None for ASCII."""
+        size = os.path.getsize(self._file_name)
+        with open(self._file_name, "rb") as f:
+            f.seek(80)
+            count = np.fromfile(f, "<u4", 1)
+            if count.size and size == 84 + FACET.itemsize * int(count[0]):
+                return np.fromfile(f, FACET, int(count[0]))
+        return None
+
+    def RequestData(self, request, inInfo, outInfo):
+        output = vtkPolyData.GetData(outInfo)
+        facets = self._facets()
+        if facets is None:
+            reader = vtkSTLReader()
+            reader.SetFileName(self._file_name)
+            reader.SetMerging(self._merging)
+            reader.Update()
+            output.ShallowCopy(reader.GetOutput())
+            return 1
+
+        corners = facets["corners"].reshape(-1, 3)
+        if corners.shape[0] == 0:
+            # A file without facets gives empty polydata, as in vtkSTLReader.
+            output.SetPoints(vtkPoints())
+            output.SetPolys(vtkCellArray())
+            return 1
+        if self._merging:
+            coordinates, ids = merge_points(corners)
+            triangles = ids.reshape(-1, 3)
+            keep = ((triangles[:, 0] != triangles[:, 1])
+                    & (triangles[:, 1] != triangles[:, 2])
+                    & (triangles[:, 0] != triangles[:, 2]))
+            if not keep.all():
+                ids = triangles[keep].ravel()
+        else:
+            coordinates = np.ascontiguousarray(corners)
+            ids = np.arange(corners.shape[0], dtype=np.int64)
+
+        points = vtkPoints()
+        points.SetData(numpy_to_vtk(coordinates))
+        cells = vtkCellArray()
+        cells.SetData(
+            numpy_to_vtk(np.arange(0, ids.size + 1, 3, dtype=np.int64),
+                         array_type=VTK_ID_TYPE),
+            numpy_to_vtk(ids, array_type=VTK_ID_TYPE))
+        output.SetPoints(points)
+        output.SetPolys(cells)
+        return 1
+
+
+def load_time(reader, repeats=3):
+    """Returns the best of a few update times of reader, in seconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        reader.Modified()
+        start = time.perf_counter()
+        reader.Update()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+# The CAD part, and a sphere with two million facets standing in for a
+# large assembly part.
+sphere = vtkSphereSource()
+sphere.SetThetaResolution(1000)
+sphere.SetPhiResolution(1000)
+large_file = os.path.join(tempfile.mkdtemp(prefix="vtk_stl_"), "sphere.stl")
+writer = vtkSTLWriter()
+writer.SetInputConnection(sphere.GetOutputPort())
+writer.SetFileTypeToBinary()
+writer.SetFileName(large_file)
+writer.Write()
+
+for file_name in (os.path.join(data_dir, "42400-IDGH.stl"), large_file):
+    vtk_reader = vtkSTLReader()
+    vtk_reader.SetFileName(file_name)
+    fast_reader = FastSTLReader()
+    fast_reader.SetFileName(file_name)
+    vtk_time = load_time(vtk_reader)
+    fast_time = load_time(fast_reader)
+    expected = vtk_reader.GetOutput()
+    result = fast_reader.GetOutputDataObject(0)
+    same = (np.array_equal(vtk_to_numpy(result.GetPoints().GetData()),
+                           vtk_to_numpy(expected.GetPoints().GetData()))
+            and np.array_equal(vtk_to_numpy(result.GetPolys().GetConnectivityArray()),
+                               vtk_to_numpy(expected.GetPolys().GetConnectivityArray())))
+    print(f"{os.path.basename(file_name)}: {result.GetNumberOfCells()} triangles, "
+          f"{result.GetNumberOfPoints()} points")
+    print(f"  vtkSTLReader {1000 * vtk_time:.1f} ms, FastSTLReader {1000 * fast_time:.1f} ms "
+          f"({vtk_time / fast_time:.1f}x), same output: {same}")
+os.remove(large_file)
+
+# Display the part as CADPart.py does.
+part = FastSTLReader()
+part.SetFileName(os.path.join(data_dir, "42400-IDGH.stl"))
+
+part_mapper = vtkPolyDataMapper()
+part_mapper.SetInputConnection(part.GetOutputPort())
+
+part_actor = vtkLODActor()
+part_actor.SetMapper(part_mapper)
+part_actor.GetProperty().SetColor(0.75, 0.75, 0.75)
+part_actor.RotateX(30.0)
+part_actor.RotateY(-45.0)
+
+renderer = vtkRenderer()
+render_window = vtkRenderWindow()
+render_window.AddRenderer(renderer)
+interactor = vtkRenderWindowInteractor()
+interactor.SetRenderWindow(render_window)
+
+renderer.AddActor(part_actor)
+renderer.SetBackground(0.1, 0.2, 0.4)
+render_window.SetSize(800, 800)
+
+interactor.Initialize()
+renderer.ResetCamera()
+renderer.GetActiveCamera().Zoom(1.5)
+render_window.Render()
+
+if "--non-interactive" not in sys.argv:
+    interactor.Start()
@@ -0,0 +1,220 @@
+"""Write one dataset to several file formats at once, and compare the formats."""
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from vtkmodules.vtkCommonDataModel import vtkPolyData
+from vtkmodules.vtkFiltersCore import vtkElevationFilter
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+from vtkmodules.vtkIOGeometry import vtkSTLReader, vtkSTLWriter
+from vtkmodules.vtkIOLegacy import vtkPolyDataReader, vtkPolyDataWriter
+from vtkmodules.vtkIOPLY import vtkPLYReader, vtkPLYWriter
+from vtkmodules.vtkIOXML import vtkXMLPolyDataReader, vtkXMLPolyDataWriter
+from vtkmodules.util.vtkAlgorithm import VTKPythonAlgorithmBase
+
+
+# Writer and reader classes by file extension.
+FORMATS = {
+    ".vtp": (vtkXMLPolyDataWriter, vtkXMLPolyDataReader),
+    ".stl": (vtkSTLWriter, vtkSTLReader),
+    ".ply": (vtkPLYWriter, vtkPLYReader),
+    ".vtk": (vtkPolyDataWriter, vtkPolyDataReader),
+}
+
+_COMPRESSORS = {
+    "none": "SetCompressorTypeToNone",
+    "zlib": "SetCompressorTypeToZLib",
+    "lz4": "SetCompressorTypeToLZ4",
+    "lzma": "SetCompressorTypeToLZMA",
+}
+
+
+class MultiFormatWriter(VTKPythonAlgorithmBase):
+    """Writes its input polydata to several files concurrently.
+
+    Files are added with AddFileName(); the extension (.vtp, .stl, .ply or
+    .vtk) selects the writer. Each file is written by its own VTK writer
+    on a thread pool, and each one gets a shallow copy of the input so that
+    no pipeline objects are shared between threads. The writes only overlap
+    if VTK releases the GIL inside Write(), which the wrappers do when VTK
+    is built with VTK_PYTHON_FULL_THREADSAFE; GetWriteTime() summed over
+    the files versus the time of Write() shows how much they overlapped.
+
+    XML files are written in appended raw binary mode with the chosen
+    compressor ("none", "zlib", "lz4" or "lzma"), compression level
+    (1 to 9) and block size in bytes. STL, PLY and legacy files are
+    binary unless SetFileTypeToASCII() is called.
+    """
+
+    def __init__(self):
+        super().__init__(nInputPorts=1, inputType="vtkPolyData", nOutputPorts=0)
+        self._file_names = []
+        self._compressor_type = "zlib"
+        self._compression_level = 5
+        self._block_size = 1 << 15
+        self._binary = True
+        self._number_of_threads = os.cpu_count() or 1
+        self._write_times = {}
+
+    def AddFileName(self, file_name):
+        extension = os.path.splitext(file_name)[1].lower()
+        if extension not in FORMATS:
+            raise ValueError(f"no writer for {extension} files")
+        self._file_names.append(file_name)
+        self.Modified()
+
+    def RemoveAllFileNames(self):
+        self._file_names = []
+        self.Modified()
+
+    def GetFileNames(self):
+        return list(self._file_names)
+
+    def SetCompressorType(self, compressor_type):
+        if compressor_type not in _COMPRESSORS:
+            raise ValueError(f"unknown compressor {compressor_type!r}")
+        if compressor_type != self._compressor_type:
+            self._compressor_type = compressor_type
+            self.Modified()
+
+    def GetCompressorType(self):
+        return self._compressor_type
+
+    def SetCompressionLevel(self, level):
+        level = min(max(int(level), 1), 9)
+        if level != self._compression_level:
+            self._compression_level = level
+            self.Modified()
+
+    def GetCompressionLevel(self):
+        return self._compression_level
+
+    def SetBlockSize(self, block_size):
+        if block_size != self._block_size:
+            self._block_size = int(block_size)
+            self.Modified()
+
+    def GetBlockSize(self):
+        return self._block_size
+
+    def SetFileTypeToBinary(self):
+        if not self._binary:
+            self._binary = True
+            self.Modified()
+
+    def SetFileTypeToASCII(self):
+        if self._binary:
+            self._binary = False
+            self.Modified()
+
+    def SetNumberOfThreads(self, n):
+        n = max(1, int(n))
+        if n != self._number_of_threads:
+            self._number_of_threads = n
+            self.Modified()
+
+    def GetNumberOfThreads(self):
+        return self._number_of_threads
+
+    def GetWriteTime(self, file_name):
+        """Returns the seconds spent writing file_name in the last Write()."""
+        return self._write_times[file_name]
+
+    def Write(self):
+        # A sink has no output to mark as out of date, so force execution.
+        self.Modified()
+        self.Update()
+
+    def _make_writer(self, file_name):
+        extension = os.path.splitext(file_name)[1].lower()
+        writer = FORMATS[extension][0]()
+        writer.SetFileName(file_name)
+        if extension == ".vtp":
+            writer.SetDataModeToAppended()
+            writer.EncodeAppendedDataOff()
+            getattr(writer, _COMPRESSORS[self._compressor_type])()
+            writer.SetCompressionLevel(self._compression_level)
+            writer.SetBlockSize(self._block_size)
+        elif self._binary:
+            writer.SetFileTypeToBinary()
+        else:
+            writer.SetFileTypeToASCII()
+        return writer
+
+    def _write_one(self, data, file_name):
+        copy = vtkPolyData()
+        copy.ShallowCopy(data)
+        writer = self._make_writer(file_name)
+        writer.SetInputData(copy)
+        start = time.perf_counter()
+        if not writer.Write():
+            raise RuntimeError(f"could not write {file_name}")
+        return time.perf_counter() - start
+
+    def RequestData(self, request, inInfo, outInfo):
+        data = vtkPolyData.GetData(inInfo[0])
+        with ThreadPoolExecutor(min(self._number_of_threads,
+                                    len(self._file_names) or 1)) as pool:
+            # list() propagates any exception raised inside a worker.
+            times = list(pool.map(lambda name: self._write_one(data, name),
+                                  self._file_names))
+        self._write_times = dict(zip(self._file_names, times))
+        return 1
+
+
+def read_time(file_name):
+    """Returns the seconds taken to read file_name back."""
+    reader = FORMATS[os.path.splitext(file_name)[1].lower()][1]()
+    reader.SetFileName(file_name)
+    start = time.perf_counter()
+    reader.Update()
+    return time.perf_counter() - start
+
+
+# The sphere of write_data.py, fine enough to be a large mesh, with an
+# elevation array so that the files carry point data as well.
+sphere = vtkSphereSource()
+sphere.SetThetaResolution(600)
+sphere.SetPhiResolution(600)
+elevation = vtkElevationFilter()
+elevation.SetInputConnection(sphere.GetOutputPort())
+elevation.SetLowPoint(0, 0, -0.5)
+elevation.SetHighPoint(0, 0, 0.5)
+elevation.Update()
+mesh = elevation.GetOutput()
+print(f"{mesh.GetNumberOfPoints()} points, {mesh.GetNumberOfCells()} triangles")
+
+output_dir = tempfile.mkdtemp(prefix="vtk_write_")
+
+# Every format at once.
+writer = MultiFormatWriter()
+writer.SetInputConnection(elevation.GetOutputPort())
+for extension in FORMATS:
+    writer.AddFileName(os.path.join(output_dir, "sphere" + extension))
+start = time.perf_counter()
+writer.Write()
+concurrent = time.perf_counter() - start
+serial = sum(writer.GetWriteTime(name) for name in writer.GetFileNames())
+print(f"{len(FORMATS)} formats in {concurrent:.2f} s with "
+      f"{writer.GetNumberOfThreads()} threads "
+      f"(the writers took {serial:.2f} s together)\n")
+
+# Size, write time and read-back time of each format, one at a time.
+print(f"{'format':<18}{'size (MiB)':>12}{'write (s)':>12}{'read (s)':>12}")
+variants = [(".vtp", name) for name in _COMPRESSORS] + [
+    (extension, "binary") for extension in (".stl", ".ply", ".vtk")]
+for extension, variant in variants:
+    file_name = os.path.join(output_dir, f"sphere_{variant}{extension}")
+    single = MultiFormatWriter()
+    single.SetInputDataObject(mesh)
+    single.AddFileName(file_name)
+    if extension == ".vtp":
+        single.SetCompressorType(variant)
+    single.Write()
+    print(f"{extension[1:] + ' ' + variant:<18}"
+          f"{os.path.getsize(file_name) / 2 ** 20:>12.2f}"
+          f"{single.GetWriteTime(file_name):>12.3f}"
+          f"{read_time(file_name):>12.3f}")
+
+print(f"\nAll files written to {output_dir}")
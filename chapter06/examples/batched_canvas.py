@@ -0,0 +1,454 @@
+"""Draw large batches of canvas primitives with one vectorized pass per type."""
+import math
+import sys
+import time
+
+import numpy as np
+
+from vtkmodules.vtkCommonCore import VTK_DOUBLE, VTK_UNSIGNED_CHAR
+from vtkmodules.vtkCommonDataModel import vtkDataObject, vtkImageData
+from vtkmodules.vtkCommonExecutionModel import vtkStreamingDemandDrivenPipeline
+from vtkmodules.vtkImagingSources import vtkImageCanvasSource2D
+from vtkmodules.util.numpy_support import vtk_to_numpy
+from vtkmodules.util.vtkAlgorithm import VTKPythonAlgorithmBase
+from vtkmodules.vtkInteractionImage import vtkImageViewer2
+from vtkmodules.vtkRenderingCore import vtkRenderWindowInteractor
+
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+import vtkmodules.vtkInteractionStyle  # noqa: F401
+
+
+def _ramp(counts):
+    """Returns 0, 1, ..., counts[i] - 1 for every group, concatenated."""
+    starts = np.cumsum(counts) - counts
+    return np.arange(counts.sum()) - np.repeat(starts, counts)
+
+
+def _spans(y, left, right, ids, extent):
+    """Clips horizontal runs [left, right] on row y to the extent."""
+    left = np.maximum(left, extent[0])
+    right = np.minimum(right, extent[1])
+    keep = (left <= right) & (y >= extent[2]) & (y <= extent[3])
+    return y[keep], left[keep], right[keep], ids[keep]
+
+
+def _pixels(y, left, right, ids):
+    """Expands runs into one (y, x, id) triple per pixel."""
+    counts = right - left + 1
+    return (np.repeat(y, counts), np.repeat(left, counts) + _ramp(counts),
+            np.repeat(ids, counts))
+
+
+def _by_primitive(parts):
+    """Concatenates runs and orders them by primitive."""
+    if not parts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    y, left, right, ids = (np.concatenate(column) for column in zip(*parts))
+    order = np.argsort(ids, kind="stable")
+    return y[order], left[order], right[order], ids[order]
+
+
+def _by_steps(steps):
+    """Sorts primitives by decreasing step count.
+
+    Returns the order and a function giving how many of the sorted
+    primitives are still active at a given step, so that each step only
+    touches a leading slice of the arrays.
+    """
+    order = np.argsort(-steps, kind="stable")
+    negated = -steps[order]
+    return order, lambda k: int(np.searchsorted(negated, -k, side="left"))
+
+
+def _fill_boxes(boxes, extent):
+    # Every bound is clamped on its own, so a box with min > max is empty.
+    x0, x1 = (np.clip(boxes[:, i], extent[0], extent[1]) for i in (0, 1))
+    y0, y1 = (np.clip(boxes[:, i], extent[2], extent[3]) for i in (2, 3))
+    rows = np.maximum(y1 - y0 + 1, 0) * (x0 <= x1)
+    ids = np.repeat(np.arange(len(boxes)), rows)
+    return np.repeat(y0, rows) + _ramp(rows), x0[ids], x1[ids], ids
+
+
+def _points(x, y, ids, extent):
+    return _spans(y, x, x.copy(), ids, extent)
+
+
+def _draw_circles(circles, extent):
+    c0 = circles[:, 0].astype(np.int64)
+    c1 = circles[:, 1].astype(np.int64)
+    radius = circles[:, 2] + 0.1
+    steps = np.ceil(2.0 * np.pi * radius).astype(np.int64)
+    # math.cos and math.sin match the C library exactly; NumPy's vectorized
+    # versions may differ in the last bit, which can move a pixel.
+    cos = np.array([math.cos(1.0 / r) for r in radius])
+    sin = np.array([math.sin(1.0 / r) for r in radius])
+
+    order, active = _by_steps(steps)
+    c0, c1, cos, sin = c0[order], c1[order], cos[order], sin[order]
+    x, y = radius[order].copy(), np.zeros(len(order))
+    parts = []
+    for k in range(int(steps.max(initial=0))):
+        m = active(k)
+        px = c0[:m] + np.trunc(x[:m]).astype(np.int64)
+        py = c1[:m] + np.trunc(y[:m]).astype(np.int64)
+        parts.append(_points(px, py, order[:m], extent))
+        # Rotate every point by one pixel of arc.
+        x[:m], y[:m] = (cos[:m] * x[:m] + sin[:m] * y[:m],
+                        -sin[:m] * x[:m] + cos[:m] * y[:m])
+    return _by_primitive(parts)
+
+
+def _clip_end(a0, a1, b0, b1, e, below):
+    """Moves end point a onto the line a0 == e if it lies beyond it."""
+    cut = a0 < e if below else a0 > e
+    fract = (b0 - e) / np.where(cut, b0 - a0, 1)
+    a1 = np.where(cut, b1 + np.trunc(fract * (a1 - b1)).astype(np.int64), a1)
+    return np.where(cut, e, a0), a1
+
+
+def _draw_segments(segments, extent):
+    a0, a1, b0, b1 = (segments[:, i] for i in range(4))
+    e0, e1, e2, e3 = extent[:4]
+
+    # Clip in the same order as vtkImageCanvasSource2D. Segments rejected
+    # here may divide by zero below, but they are dropped afterwards.
+    keep = ~(((a0 < e0) & (b0 < e0)) | ((a0 > e1) & (b0 > e1))
+             | ((a1 < e2) & (b1 < e2)) | ((a1 > e3) & (b1 > e3)))
+    with np.errstate(all="ignore"):
+        a0, a1 = _clip_end(a0, a1, b0, b1, e0, True)
+        b0, b1 = _clip_end(b0, b1, a0, a1, e0, True)
+        a0, a1 = _clip_end(a0, a1, b0, b1, e1, False)
+        b0, b1 = _clip_end(b0, b1, a0, a1, e1, False)
+        keep &= ~(((a1 < e2) & (b1 < e2)) | ((a1 > e3) & (b1 > e3)))
+        a1, a0 = _clip_end(a1, a0, b1, b0, e2, True)
+        b1, b0 = _clip_end(b1, b0, a1, a0, e2, True)
+        a1, a0 = _clip_end(a1, a0, b1, b0, e3, False)
+        b1, b0 = _clip_end(b1, b0, a1, a0, e3, False)
+    ids = np.flatnonzero(keep)
+    a0, a1, b0, b1 = a0[ids], a1[ids], b0[ids], b1[ids]
+
+    # Walk from b to a, stepping each axis when its error term passes 1.
+    p0, p1 = a0 - b0, a1 - b1
+    inc0, inc1 = np.where(p0 < 0, -1, 1), np.where(p1 < 0, -1, 1)
+    p0, p1 = np.abs(p0), np.abs(p1)
+    steps = np.maximum(p0, p1)
+    n = np.maximum(steps, 1)
+    s0, s1 = p0 / n, p1 / n
+
+    order, active = _by_steps(steps)
+    x, y = b0[order], b1[order]
+    inc0, inc1, s0, s1 = inc0[order], inc1[order], s0[order], s1[order]
+    f0, f1 = np.full(len(order), 0.5), np.full(len(order), 0.5)
+    ids = ids[order]
+    parts = [_points(x.copy(), y.copy(), ids, extent)]
+    for k in range(int(steps.max(initial=0))):
+        m = active(k)
+        f0[:m] += s0[:m]
+        step = f0[:m] > 1.0
+        x[:m] += inc0[:m] * step
+        np.subtract(f0[:m], 1.0, out=f0[:m], where=step)
+        f1[:m] += s1[:m]
+        step = f1[:m] > 1.0
+        y[:m] += inc1[:m] * step
+        np.subtract(f1[:m], 1.0, out=f1[:m], where=step)
+        parts.append(_points(x[:m].copy(), y[:m].copy(), ids[:m], extent))
+    return _by_primitive(parts)
+
+
+def _fill_tubes(tubes, extent):
+    a0, a1, b0, b1 = (tubes[:, i].astype(np.int64) for i in range(4))
+    radius = tubes[:, 4]
+    n0, n1 = a0 - b0, a1 - b1
+    ak, bk = n0 * a0 + n1 * a1, n0 * b0 + n1 * b1
+    # A tube whose end points coincide draws nothing.
+    ids = np.flatnonzero(ak != bk)
+
+    # Bound the pixels to test on every row by the strip between the end
+    # caps and the band of half-width radius around the axis, widened by
+    # one pixel. The exact test below decides the pixels on the border.
+    pad = np.ceil(radius[ids]).astype(np.int64) + 1
+    y0 = np.maximum(np.minimum(a1[ids], b1[ids]) - pad, extent[2])
+    y1 = np.minimum(np.maximum(a1[ids], b1[ids]) + pad, extent[3])
+    rows = np.maximum(y1 - y0 + 1, 0)
+    t = np.repeat(ids, rows)
+    y = np.repeat(y0, rows) + _ramp(rows)
+    lo = (np.minimum(a0[t], b0[t]) - np.repeat(pad, rows)).astype(float)
+    hi = (np.maximum(a0[t], b0[t]) + np.repeat(pad, rows)).astype(float)
+    with np.errstate(all="ignore"):
+        ends = np.sort([(bk[t] - n1[t] * y) / n0[t], (ak[t] - n1[t] * y) / n0[t]], axis=0)
+        half = radius[t] * np.sqrt((ak[t] - bk[t]).astype(float))
+        sides = np.sort([b0[t] + (n0[t] * (y - b1[t]) - half) / n1[t],
+                         b0[t] + (n0[t] * (y - b1[t]) + half) / n1[t]], axis=0)
+    for (low, high), valid in ((ends, n0[t] != 0), (sides, n1[t] != 0)):
+        lo = np.where(valid, np.maximum(lo, low), lo)
+        hi = np.where(valid, np.minimum(hi, high), hi)
+    y, x, t = _pixels(*_spans(y, np.floor(lo).astype(np.int64) - 1,
+                              np.ceil(hi).astype(np.int64) + 1, t, extent))
+
+    k = n0[t] * x + n1[t] * y
+    fract = (k - bk[t]) / (ak[t] - bk[t]).astype(float)
+    v0 = fract * n0[t] + b0[t] - x
+    v1 = fract * n1[t] + b1[t] - y
+    keep = (k >= bk[t]) & (k <= ak[t]) & (np.sqrt(v0 * v0 + v1 * v1) <= radius[t])
+    y, x, t = y[keep], x[keep], t[keep]
+    if len(t) == 0:
+        return y, x, x, t
+
+    # Merge neighbouring pixels of the same tube and row back into runs.
+    start = np.ones(len(t), dtype=bool)
+    start[1:] = (t[1:] != t[:-1]) | (y[1:] != y[:-1]) | (x[1:] != x[:-1] + 1)
+    first = np.flatnonzero(start)
+    last = np.append(first[1:], len(t)) - 1
+    return y[first], x[first], x[last], t[first]
+
+
+def _fill_triangles(triangles, extent):
+    points = triangles.reshape(-1, 3, 2).astype(np.int64)
+    # vtkImageCanvasSource2D sorts the corners by row, except when the
+    # first and last corners already share a row.
+    order = np.argsort(points[:, :, 1], axis=1, kind="stable")
+    order[points[:, 0, 1] == points[:, 2, 1]] = [0, 1, 2]
+    points = np.take_along_axis(points, order[:, :, np.newaxis], axis=1)
+    (a0, a1), (b0, b1), (c0, c1) = (points[:, i].T for i in range(3))
+
+    def step(d0, d1):
+        return d0 / np.where(d1 + 1 == 0, 1, d1 + 1)
+
+    long_step = step(c0 - a0, c1 - a1)
+    long_t = a0 + 0.5 * long_step
+    short_step = step(b0 - a0, b1 - a1)
+    short_t = a0 + 0.5 * short_step
+    second_step = step(c0 - b0, c1 - b1)
+    second_t = b0 + 0.5 * second_step
+    first_rows = np.maximum(b1 - a1, 0)
+    steps = first_rows + np.maximum(c1 - b1, 0)
+
+    order, active = _by_steps(steps)
+    a1, b1, first_rows = a1[order], b1[order], first_rows[order]
+    long_step, long_t = long_step[order], long_t[order]
+    short_step, short_t = short_step[order], short_t[order]
+    second_step, second_t = second_step[order], second_t[order]
+    parts = []
+    for k in range(int(steps.max(initial=0))):
+        m = active(k)
+        # Triangles reaching their middle corner switch to the second edge.
+        switch = first_rows[:m] == k
+        short_t[:m][switch] = second_t[:m][switch]
+        short_step[:m][switch] = second_step[:m][switch]
+
+        y = np.where(k < first_rows[:m], a1[:m] + k, b1[:m] + k - first_rows[:m])
+        left = np.trunc(short_t[:m] + 0.5).astype(np.int64)
+        right = np.trunc(long_t[:m] + 0.5).astype(np.int64)
+        parts.append(_spans(y, np.minimum(left, right), np.maximum(left, right),
+                            order[:m], extent))
+        long_t[:m] += long_step[:m]
+        short_t[:m] += short_step[:m]
+    return _by_primitive(parts)
+
+
+class BatchedImageCanvasSource2D(VTKPythonAlgorithmBase):
+    """Draws arrays of primitives with the rules of vtkImageCanvasSource2D.
+
+    Each Fill/Draw call takes an array with one primitive per row and adds
+    it as a batch. Batches are drawn in the order they were added and later
+    primitives overwrite earlier ones, so the output is pixel-identical to
+    making the same calls one at a time on a vtkImageCanvasSource2D. Every
+    batch is rasterized with NumPy operations over all of its primitives at
+    once; stepped primitives (circles, segments, triangles) advance all of
+    their points together, one step per loop iteration.
+
+    A color is either one value or tuple for the whole batch, or a 2-D
+    array with one row per primitive. FillPixel has no batched form: it is a
+    flood fill, so its result depends on everything drawn before it.
+    """
+
+    def __init__(self):
+        super().__init__(nInputPorts=0, nOutputPorts=1, outputType="vtkImageData")
+        self._extent = (0, -1, 0, -1, 0, -1)
+        self._default_z = 0
+        self._scalar_type = VTK_DOUBLE
+        self._number_of_components = 1
+        self._batches = []
+        self._chunk_size = 1 << 22
+
+    def SetExtent(self, *extent):
+        self._extent = tuple(int(e) for e in extent)
+        self.Modified()
+
+    def SetDefaultZ(self, z):
+        self._default_z = int(z)
+        self.Modified()
+
+    def SetScalarType(self, vtk_type):
+        self._scalar_type = vtk_type
+        self.Modified()
+
+    def SetNumberOfScalarComponents(self, n):
+        self._number_of_components = int(n)
+        self.Modified()
+
+    def _add(self, rasterize, primitives, columns, color, dtype=np.int64):
+        primitives = np.asarray(primitives, dtype=dtype).reshape(-1, columns)
+        color = np.asarray(color, dtype=float)
+        if color.ndim < 2:
+            color = color.reshape(1, -1)
+        elif len(color) != len(primitives):
+            raise ValueError("need one color per primitive")
+        self._batches.append((rasterize, primitives, color))
+        self.Modified()
+
+    def FillBoxes(self, boxes, color):
+        """boxes holds (min0, max0, min1, max1) rows."""
+        self._add(_fill_boxes, boxes, 4, color)
+
+    def DrawCircles(self, circles, color):
+        """circles holds (c0, c1, radius) rows."""
+        self._add(_draw_circles, circles, 3, color, dtype=float)
+
+    def DrawSegments(self, segments, color):
+        """segments holds (a0, a1, b0, b1) rows."""
+        self._add(_draw_segments, segments, 4, color)
+
+    def FillTubes(self, tubes, color):
+        """tubes holds (a0, a1, b0, b1, radius) rows."""
+        self._add(_fill_tubes, tubes, 5, color, dtype=float)
+
+    def FillTriangles(self, triangles, color):
+        """triangles holds (a0, a1, b0, b1, c0, c1) rows."""
+        self._add(_fill_triangles, triangles, 6, color)
+
+    def ClearPrimitives(self):
+        self._batches = []
+        self.Modified()
+
+    def RequestInformation(self, request, inInfo, outInfo):
+        out_info = outInfo.GetInformationObject(0)
+        out_info.Set(vtkStreamingDemandDrivenPipeline.WHOLE_EXTENT(), self._extent, 6)
+        vtkDataObject.SetPointDataActiveScalarInfo(
+            out_info, self._scalar_type, self._number_of_components)
+        return 1
+
+    def _paint(self, plane, runs, values):
+        """Writes the runs of one batch into the (ny, nx, ncomp) plane."""
+        y, left, right, ids = runs
+        offsets = np.concatenate([[0], np.cumsum(right - left + 1)])
+        top, bottom = y.min(), y.max()
+        band = (bottom - top + 1) * plane.shape[1]
+        if len(values) == 1 and offsets[-1] > band:
+            # With a single color only coverage matters. For large fills it
+            # is cheaper to mark where each run starts and ends and take a
+            # running sum along the rows than to list every pixel.
+            cover = np.zeros((bottom - top + 1, plane.shape[1] + 1), dtype=np.int32)
+            np.add.at(cover, (y - top, left), 1)
+            np.add.at(cover, (y - top, right + 1), -1)
+            covered = np.cumsum(cover, axis=1, dtype=np.int32)[:, :-1] > 0
+            plane[top:bottom + 1][covered] = values[0]
+            return
+
+        # NumPy assigns repeated indices in order, so with the runs sorted
+        # by primitive the last primitive drawn wins, as on the canvas.
+        # Pixels are expanded in chunks to bound the index arrays.
+        flat_plane = plane.reshape(-1, plane.shape[2])
+        i = 0
+        while i < len(ids):
+            j = int(np.searchsorted(offsets, offsets[i] + self._chunk_size, side="right")) - 1
+            j = max(j, i + 1)
+            py, px, pid = _pixels(y[i:j], left[i:j], right[i:j], ids[i:j])
+            flat_plane[py * plane.shape[1] + px] = values[pid] if len(values) > 1 else values[0]
+            i = j
+
+    def RequestData(self, request, inInfo, outInfo):
+        output = vtkImageData.GetData(outInfo)
+        extent = self._extent
+        output.SetExtent(extent)
+        output.AllocateScalars(self._scalar_type, self._number_of_components)
+        out = vtk_to_numpy(output.GetPointData().GetScalars())
+        out[...] = 0
+
+        z = self._default_z
+        if not extent[4] <= z <= extent[5]:
+            return 1
+        ncomp = self._number_of_components
+        nx = extent[1] - extent[0] + 1
+        ny = extent[3] - extent[2] + 1
+        plane = out.reshape(-1, ny, nx, ncomp)[z - extent[4]]
+
+        for rasterize, primitives, color in self._batches:
+            y, left, right, ids = rasterize(primitives, extent)
+            if len(ids) == 0:
+                continue
+            # Missing components are zero, as with SetDrawColor.
+            values = np.zeros((len(color), ncomp))
+            values[:, :min(ncomp, color.shape[1])] = color[:, :ncomp]
+            values = values.astype(out.dtype)
+            if (values == values[0]).all():
+                values = values[:1]
+            self._paint(plane, (y - extent[2], left - extent[0],
+                                right - extent[0], ids), values)
+        return 1
+
+
+# A fixture with thousands of primitives, checked against the
+# sequential vtkImageCanvasSource2D calls.
+size = 1024
+rng = np.random.default_rng(0)
+n = 400
+fixture = {
+    "FillBox": np.sort(rng.integers(-50, size + 50, (n, 2, 2)), axis=2).reshape(n, 4),
+    "DrawCircle": np.column_stack([rng.integers(0, size, (n, 2)),
+                                   rng.uniform(1, 60, n)]),
+    "DrawSegment": rng.integers(-100, size + 100, (n, 4)),
+    "FillTube": np.column_stack([rng.integers(0, size, (n, 4)),
+                                 rng.uniform(1, 8, n)]),
+    "FillTriangle": rng.integers(0, size, (n, 6)),
+}
+colors = {name: rng.integers(1, 256, (n, 1)) for name in fixture}
+colors["FillBox"][:] = 60
+
+batched = BatchedImageCanvasSource2D()
+batched.SetScalarType(VTK_UNSIGNED_CHAR)
+batched.SetExtent(0, size - 1, 0, size - 1, 0, 0)
+sequential = vtkImageCanvasSource2D()
+sequential.SetScalarTypeToUnsignedChar()
+sequential.SetExtent(0, size - 1, 0, size - 1, 0, 0)
+sequential.SetDrawColor(0)
+sequential.FillBox(0, size - 1, 0, size - 1)
+
+start = time.perf_counter()
+for name, primitives in fixture.items():
+    draw = getattr(sequential, name)
+    for row, color in zip(primitives, colors[name]):
+        args = [int(v) for v in row]
+        if name in ("DrawCircle", "FillTube"):
+            args[-1] = float(row[-1])
+        sequential.SetDrawColor(float(color[0]))
+        draw(*args)
+sequential.Update()
+print(f"Sequential canvas: {1000 * (time.perf_counter() - start):.0f} ms")
+
+start = time.perf_counter()
+batched.FillBoxes(fixture["FillBox"], colors["FillBox"])
+batched.DrawCircles(fixture["DrawCircle"], colors["DrawCircle"])
+batched.DrawSegments(fixture["DrawSegment"], colors["DrawSegment"])
+batched.FillTubes(fixture["FillTube"], colors["FillTube"])
+batched.FillTriangles(fixture["FillTriangle"], colors["FillTriangle"])
+batched.Update()
+print(f"Batched canvas: {1000 * (time.perf_counter() - start):.0f} ms")
+
+expected = vtk_to_numpy(sequential.GetOutput().GetPointData().GetScalars())
+result = vtk_to_numpy(batched.GetOutputDataObject(0).GetPointData().GetScalars())
+print("Pixel-identical:", np.array_equal(expected, result))
+
+# Display the result
+viewer = vtkImageViewer2()
+viewer.SetInputConnection(batched.GetOutputPort())
+viewer.SetColorWindow(256)
+viewer.SetColorLevel(127.5)
+
+interactor = vtkRenderWindowInteractor()
+viewer.SetupInteractor(interactor)
+viewer.Render()
+
+if "--non-interactive" not in sys.argv:
+    interactor.Start()
@@ -0,0 +1,258 @@
+"""Anisotropic diffusion on a thread pool, stopping once the image settles."""
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkImagingCore import vtkImageShiftScale
+from vtkmodules.vtkImagingGeneral import vtkImageAnisotropicDiffusion2D
+from vtkmodules.vtkImagingMath import vtkImageMathematics
+from vtkmodules.vtkImagingSources import vtkImageCanvasSource2D, vtkImageNoiseSource
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+from vtkmodules.util.vtkAlgorithm import VTKPythonAlgorithmBase
+from vtkmodules.vtkInteractionImage import vtkImageViewer2
+from vtkmodules.vtkRenderingCore import vtkRenderWindowInteractor
+
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+import vtkmodules.vtkInteractionStyle  # noqa: F401
+
+
+class ThreadedAnisotropicDiffusion2D(VTKPythonAlgorithmBase):
+    """Edge-preserving diffusion with the rules of vtkImageAnisotropicDiffusion2D.
+
+    Each iteration moves a pixel towards every edge and corner neighbor
+    whose difference is below DiffusionThreshold (scaled by the neighbor
+    distance), so the output matches vtkImageAnisotropicDiffusion2D for the
+    same number of iterations. The image is cut into tiles of TileSize rows
+    that are updated in parallel; a tile reads a one-row halo from its
+    neighbors in the previous iteration's buffer, so tiles never wait on
+    each other within an iteration.
+
+    NumberOfIterations is an upper bound. With a Tolerance above zero the
+    filter stops after the first iteration whose largest change is below
+    it. The time and largest change of every iteration run are attached to
+    the output as the field data arrays "IterationTime" (seconds) and
+    "Residual".
+    """
+
+    def __init__(self):
+        super().__init__(
+            nInputPorts=1, inputType="vtkImageData",
+            nOutputPorts=1, outputType="vtkImageData",
+        )
+        self._number_of_iterations = 4
+        self._diffusion_threshold = 5.0
+        self._diffusion_factor = 1.0
+        self._edges = True
+        self._corners = True
+        self._tolerance = 0.0
+        self._tile_size = 64
+        self._number_of_threads = os.cpu_count() or 1
+        self._iterations_run = 0
+
+    def SetNumberOfIterations(self, n):
+        self._number_of_iterations = int(n)
+        self.Modified()
+
+    def SetDiffusionThreshold(self, value):
+        self._diffusion_threshold = float(value)
+        self.Modified()
+
+    def SetDiffusionFactor(self, value):
+        self._diffusion_factor = float(value)
+        self.Modified()
+
+    def EdgesOn(self):
+        self._edges = True
+        self.Modified()
+
+    def EdgesOff(self):
+        self._edges = False
+        self.Modified()
+
+    def CornersOn(self):
+        self._corners = True
+        self.Modified()
+
+    def CornersOff(self):
+        self._corners = False
+        self.Modified()
+
+    def SetTolerance(self, value):
+        """Stop once no pixel changes by this much; 0 runs every iteration."""
+        self._tolerance = float(value)
+        self.Modified()
+
+    def SetTileSize(self, rows):
+        self._tile_size = max(1, int(rows))
+        self.Modified()
+
+    def SetNumberOfThreads(self, n):
+        self._number_of_threads = max(1, int(n))
+        self.Modified()
+
+    def GetNumberOfIterationsRun(self):
+        return self._iterations_run
+
+    def _neighbors(self, spacing):
+        """Returns (dy, dx, factor, threshold) for every neighbor used."""
+        offsets = []
+        if self._edges:
+            offsets += [(0, -1, spacing[0]), (0, 1, spacing[0]),
+                        (-1, 0, spacing[1]), (1, 0, spacing[1])]
+        if self._corners:
+            diagonal = math.hypot(spacing[0], spacing[1])
+            offsets += [(dy, dx, diagonal) for dy in (-1, 1) for dx in (-1, 1)]
+        total = sum(1.0 / distance for _, _, distance in offsets)
+        return [(dy, dx, self._diffusion_factor / (distance * total),
+                 self._diffusion_threshold * distance)
+                for dy, dx, distance in offsets]
+
+    @staticmethod
+    def _diffuse_tile(src, dst, y0, y1, neighbors):
+        """Updates rows [y0, y1) of dst from src; returns the largest change."""
+        ny, nx = src.shape[1:3]
+        dst[:, y0:y1] = src[:, y0:y1]
+        for dy, dx, factor, threshold in neighbors:
+            # Pixels on the image border skip neighbors that do not exist.
+            rows = slice(max(y0, -dy), min(y1, ny - dy))
+            cols = slice(max(0, -dx), min(nx, nx - dx))
+            near = (slice(rows.start + dy, rows.stop + dy),
+                    slice(cols.start + dx, cols.stop + dx))
+            diff = src[:, near[0], near[1]] - src[:, rows, cols]
+            diff[np.abs(diff) >= threshold] = 0
+            diff *= factor
+            dst[:, rows, cols] += diff
+        if y1 <= y0:
+            return 0.0
+        return float(np.abs(dst[:, y0:y1] - src[:, y0:y1]).max())
+
+    def RequestData(self, request, inInfo, outInfo):
+        image = vtkImageData.GetData(inInfo[0])
+        output = vtkImageData.GetData(outInfo)
+        if image.GetNumberOfPoints() == 0:
+            # There are no tiles, so there is nothing to diffuse.
+            output.ShallowCopy(image)
+            self._iterations_run = 0
+            return 1
+
+        in_scalars = image.GetPointData().GetScalars()
+        nx, ny, nz = image.GetDimensions()
+        n_components = in_scalars.GetNumberOfComponents()
+        values = vtk_to_numpy(in_scalars).reshape(nz, ny, nx, n_components)
+
+        # Like vtkImageAnisotropicDiffusion2D, iterate in float unless the
+        # input is already double.
+        dtype = np.float64 if values.dtype == np.float64 else np.float32
+        src = values.astype(dtype)
+        dst = np.empty_like(src)
+
+        neighbors = self._neighbors(image.GetSpacing())
+        tiles = [(y, min(y + self._tile_size, ny))
+                 for y in range(0, ny, self._tile_size)]
+        times, residuals = [], []
+        with ThreadPoolExecutor(self._number_of_threads) as pool:
+            for _ in range(self._number_of_iterations):
+                start = time.perf_counter()
+                changes = list(pool.map(
+                    lambda tile: self._diffuse_tile(src, dst, *tile, neighbors),
+                    tiles))
+                src, dst = dst, src
+                times.append(time.perf_counter() - start)
+                residuals.append(max(changes))
+                if residuals[-1] < self._tolerance:
+                    break
+        self._iterations_run = len(times)
+
+        output.CopyStructure(image)
+        output.AllocateScalars(in_scalars.GetDataType(), n_components)
+        out_scalars = output.GetPointData().GetScalars()
+        out_scalars.SetName(in_scalars.GetName())
+        out = vtk_to_numpy(out_scalars).reshape(src.shape)
+        np.copyto(out, src, casting="unsafe")
+
+        for name, series in (("IterationTime", times), ("Residual", residuals)):
+            array = numpy_to_vtk(np.array(series, dtype=np.float64), deep=1)
+            array.SetName(name)
+            output.GetFieldData().AddArray(array)
+        return 1
+
+
+# The noisy test image from anisotropic_diffusion.py, scaled to the 16-bit
+# range of a microscopy mosaic.
+canvas = vtkImageCanvasSource2D()
+canvas.SetScalarTypeToDouble()
+canvas.SetNumberOfScalarComponents(1)
+canvas.SetExtent(0, 1023, 0, 1023, 0, 0)
+canvas.SetDrawColor(0)
+canvas.FillBox(0, 1023, 0, 1023)
+canvas.SetDrawColor(255)
+canvas.FillBox(160, 480, 160, 480)
+canvas.SetDrawColor(180)
+canvas.FillBox(560, 880, 240, 800)
+
+noise = vtkImageNoiseSource()
+noise.SetWholeExtent(0, 1023, 0, 1023, 0, 0)
+noise.SetMinimum(0)
+noise.SetMaximum(40)
+
+add = vtkImageMathematics()
+add.SetOperationToAdd()
+add.SetInputConnection(0, canvas.GetOutputPort())
+add.SetInputConnection(1, noise.GetOutputPort())
+
+mosaic = vtkImageShiftScale()
+mosaic.SetInputConnection(add.GetOutputPort())
+mosaic.SetScale(200)
+mosaic.SetOutputScalarTypeToUnsignedShort()
+mosaic.Update()
+
+diffusion = ThreadedAnisotropicDiffusion2D()
+diffusion.SetInputConnection(mosaic.GetOutputPort())
+diffusion.SetNumberOfIterations(100)
+diffusion.SetDiffusionThreshold(4000.0)
+diffusion.SetDiffusionFactor(1.0)
+diffusion.SetTolerance(100.0)
+
+start = time.perf_counter()
+diffusion.Update()
+elapsed = time.perf_counter() - start
+field_data = diffusion.GetOutputDataObject(0).GetFieldData()
+residuals = vtk_to_numpy(field_data.GetArray("Residual"))
+times = vtk_to_numpy(field_data.GetArray("IterationTime"))
+print(f"Threaded: {diffusion.GetNumberOfIterationsRun()} iterations in "
+      f"{1000 * elapsed:.0f} ms ({1000 * times.mean():.1f} ms each)")
+print("Residuals:", " ".join(f"{r:.0f}" for r in residuals))
+
+# vtkImageAnisotropicDiffusion2D needs to be told how many iterations to run.
+reference = vtkImageAnisotropicDiffusion2D()
+reference.SetInputConnection(mosaic.GetOutputPort())
+reference.SetNumberOfIterations(diffusion.GetNumberOfIterationsRun())
+reference.SetDiffusionThreshold(4000.0)
+reference.SetDiffusionFactor(1.0)
+start = time.perf_counter()
+reference.Update()
+print(f"vtkImageAnisotropicDiffusion2D: {1000 * (time.perf_counter() - start):.0f} ms")
+
+expected = vtk_to_numpy(reference.GetOutput().GetPointData().GetScalars()).astype(int)
+result = vtk_to_numpy(diffusion.GetOutputDataObject(0).GetPointData().GetScalars())
+print("Largest difference:", np.abs(result.astype(int) - expected).max())
+
+# Display diffused result.
+viewer = vtkImageViewer2()
+viewer.SetInputConnection(diffusion.GetOutputPort())
+viewer.SetColorWindow(60000)
+viewer.SetColorLevel(30000)
+viewer.GetRenderWindow().SetSize(400, 400)
+viewer.GetRenderer().SetBackground(0.2, 0.3, 0.4)
+
+interactor = vtkRenderWindowInteractor()
+viewer.SetupInteractor(interactor)
+viewer.Render()
+
+if "--non-interactive" not in sys.argv:
+    interactor.Start()
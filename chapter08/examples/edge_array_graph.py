@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""Build graphs and trees from NumPy edge arrays.
+
+Creates the tree from create_tree.py out of a parent/child edge list,
+builds a large random graph both one edge at a time and from arrays to
+compare the timings, and checks a large random tree with NumPy.
+"""
+
+import time
+import numpy as np
+
+from vtkmodules.vtkCommonCore import vtkAbstractArray, vtkDoubleArray, vtkStringArray
+from vtkmodules.vtkCommonDataModel import (
+    vtkDataObject,
+    vtkDirectedGraph,
+    vtkGraph,
+    vtkMutableDirectedGraph,
+    vtkMutableUndirectedGraph,
+    vtkTree,
+    vtkUndirectedGraph,
+)
+from vtkmodules.util.numpy_support import numpy_to_vtk
+from vtkmodules.util.vtkAlgorithm import VTKPythonAlgorithmBase
+from vtkmodules.vtkViewsInfovis import vtkGraphLayoutView
+from vtkmodules.vtkViewsCore import vtkViewTheme
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+
+DIRECTED_GRAPH, UNDIRECTED_GRAPH, TREE = 0, 1, 2
+
+
+def _to_vtk_array(name, values):
+    """Wraps values as a named VTK array; VTK arrays are used as they are."""
+    if isinstance(values, vtkAbstractArray):
+        array = values
+    else:
+        values = np.asarray(values)
+        if values.dtype.kind in "OSU":
+            # VTK has no bulk import for strings, so these are set one by one.
+            array = vtkStringArray()
+            array.SetNumberOfValues(len(values))
+            for i, value in enumerate(values.tolist()):
+                array.SetValue(i, value)
+        else:
+            array = numpy_to_vtk(np.ascontiguousarray(values), deep=1)
+    array.SetName(name)
+    return array
+
+
+class EdgeArrayGraphSource(VTKPythonAlgorithmBase):
+    """Produces a vtkGraph or vtkTree from arrays of edge end points.
+
+    SetEdges() takes two integer arrays, edge i running from sources[i] to
+    targets[i], and VTK edge ids follow that order. The edges are also kept
+    as a compressed sparse row (CSR) adjacency: the out-edges of vertex v are
+    the slots offsets[v]:offsets[v + 1] of the targets and edge id arrays
+    returned by GetCSR(). Vertex and edge attributes are added from NumPy or
+    VTK arrays in a single call each. VTK has no bulk edge import, though,
+    so the edges themselves are still added with one call per edge.
+
+    With the output type set to tree, the edges are checked with NumPy
+    before the graph is built, so an invalid tree is reported with the
+    reason instead of the bare failure of vtkTree.CheckedShallowCopy().
+    CheckedShallowCopy() is the only way to fill a vtkTree, so a valid
+    tree is checked a second time there.
+    """
+
+    def __init__(self):
+        super().__init__(nInputPorts=0, nOutputPorts=1, outputType="vtkGraph")
+        self._output_type = DIRECTED_GRAPH
+        self._sources = np.zeros(0, dtype=np.int64)
+        self._targets = np.zeros(0, dtype=np.int64)
+        self._number_of_vertices = None
+        self._vertex_arrays = {}
+        self._edge_arrays = {}
+        self._csr = None
+
+    def SetOutputTypeToDirectedGraph(self):
+        self._output_type = DIRECTED_GRAPH
+        self.Modified()
+
+    def SetOutputTypeToUndirectedGraph(self):
+        self._output_type = UNDIRECTED_GRAPH
+        self.Modified()
+
+    def SetOutputTypeToTree(self):
+        self._output_type = TREE
+        self.Modified()
+
+    def SetEdges(self, sources, targets):
+        sources = np.asarray(sources, dtype=np.int64).ravel()
+        targets = np.asarray(targets, dtype=np.int64).ravel()
+        if sources.shape != targets.shape:
+            raise ValueError("sources and targets must have the same length")
+        if sources.size and min(sources.min(), targets.min()) < 0:
+            raise ValueError("vertex ids must not be negative")
+        self._sources = sources
+        self._targets = targets
+        self._csr = None
+        self.Modified()
+
+    def SetNumberOfVertices(self, n):
+        """Sets the vertex count; by default it is the largest id plus one."""
+        self._number_of_vertices = None if n is None else int(n)
+        self._csr = None
+        self.Modified()
+
+    def GetNumberOfVertices(self):
+        if self._number_of_vertices is not None:
+            return self._number_of_vertices
+        if self._sources.size == 0:
+            return 0
+        return int(max(self._sources.max(), self._targets.max())) + 1
+
+    def AddVertexArray(self, name, values):
+        self._vertex_arrays[name] = values
+        self.Modified()
+
+    def AddEdgeArray(self, name, values):
+        self._edge_arrays[name] = values
+        self.Modified()
+
+    def RemoveAllArrays(self):
+        self._vertex_arrays.clear()
+        self._edge_arrays.clear()
+        self.Modified()
+
+    def _check_vertex_ids(self):
+        """Raises ValueError if an edge ends at a vertex beyond the count."""
+        n = self.GetNumberOfVertices()
+        if self._sources.size and max(self._sources.max(), self._targets.max()) >= n:
+            raise ValueError(f"edge end points must be below {n}")
+        return n
+
+    def GetCSR(self):
+        """Returns (offsets, targets, edge_ids) of the out-edge adjacency."""
+        if self._csr is None:
+            n = self._check_vertex_ids()
+            # A stable sort keeps the edges of each vertex in input order.
+            order = np.argsort(self._sources, kind="stable")
+            offsets = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self._sources, minlength=n), out=offsets[1:])
+            self._csr = (offsets, self._targets[order], order)
+        return self._csr
+
+    def CheckTree(self):
+        """Raises ValueError unless the edges form a single rooted tree."""
+        n = self._check_vertex_ids()
+        if n == 0:
+            raise ValueError("a tree needs at least one vertex")
+        if self._sources.size != n - 1:
+            raise ValueError(f"a tree with {n} vertices needs {n - 1} edges, "
+                             f"not {self._sources.size}")
+        in_degree = np.bincount(self._targets, minlength=n)
+        if in_degree.max() > 1:
+            vertex = int(np.argmax(in_degree))
+            raise ValueError(f"vertex {vertex} has {in_degree[vertex]} parents")
+        # n - 1 edges with at most one parent each leave exactly one root.
+        root = int(np.argmin(in_degree))
+
+        # Pointer jumping: after k rounds every vertex points at its ancestor
+        # 2**k levels up, so vertices on a path to the root reach it within
+        # log2(n) rounds while vertices on a cycle never do.
+        parent = np.empty(n, dtype=np.int64)
+        parent[self._targets] = self._sources
+        parent[root] = root
+        for _ in range(max(1, n.bit_length())):
+            parent = parent[parent]
+        unreached = np.flatnonzero(parent != root)
+        if unreached.size:
+            raise ValueError(f"vertex {unreached[0]} is on a cycle, not "
+                             f"below the root {root}")
+
+    def RequestDataObject(self, request, inInfo, outInfo):
+        out_type = {DIRECTED_GRAPH: vtkDirectedGraph,
+                    UNDIRECTED_GRAPH: vtkUndirectedGraph,
+                    TREE: vtkTree}[self._output_type]
+        out_info = outInfo.GetInformationObject(0)
+        output = out_info.Get(vtkDataObject.DATA_OBJECT())
+        if output is None or not output.IsA(out_type.__name__):
+            out_info.Set(vtkDataObject.DATA_OBJECT(), out_type())
+        return 1
+
+    def RequestData(self, request, inInfo, outInfo):
+        output = vtkGraph.GetData(outInfo)
+        n = self._check_vertex_ids()
+        if self._output_type == TREE:
+            self.CheckTree()
+
+        if self._output_type == UNDIRECTED_GRAPH:
+            builder = vtkMutableUndirectedGraph()
+        else:
+            builder = vtkMutableDirectedGraph()
+        builder.SetNumberOfVertices(n)
+        # VTK has no bulk edge import, so this is one call per edge.
+        for source, target in zip(self._sources.tolist(), self._targets.tolist()):
+            builder.AddGraphEdge(source, target)
+
+        for name, values in self._vertex_arrays.items():
+            array = _to_vtk_array(name, values)
+            if array.GetNumberOfTuples() != n:
+                raise ValueError(f"vertex array {name!r} needs {n} values")
+            builder.GetVertexData().AddArray(array)
+        for name, values in self._edge_arrays.items():
+            array = _to_vtk_array(name, values)
+            if array.GetNumberOfTuples() != self._sources.size:
+                raise ValueError(f"edge array {name!r} needs {self._sources.size} values")
+            builder.GetEdgeData().AddArray(array)
+
+        if not output.CheckedShallowCopy(builder):
+            raise ValueError(f"edges do not form a valid {output.GetClassName()}")
+        return 1
+
+
+# The tree from create_tree.py as a parent -> child edge list
+tree_source = EdgeArrayGraphSource()
+tree_source.SetOutputTypeToTree()
+tree_source.SetEdges([0, 0, 1, 2, 2], [1, 2, 3, 4, 5])
+tree_source.AddVertexArray("Label", np.array(["a", "b", "c", "d", "e", "f"]))
+
+# A random graph with 50,000 vertices and 200,000 weighted edges
+rng = np.random.default_rng(0)
+n_vertices, n_edges = 50_000, 200_000
+sources = rng.integers(0, n_vertices, n_edges)
+targets = rng.integers(0, n_vertices, n_edges)
+weights = rng.random(n_edges)
+
+start = time.perf_counter()
+graph = vtkMutableDirectedGraph()
+for _ in range(n_vertices):
+    graph.AddVertex()
+weight_array = vtkDoubleArray()
+weight_array.SetName("Weight")
+for source, target, weight in zip(sources.tolist(), targets.tolist(),
+                                  weights.tolist()):
+    graph.AddEdge(source, target)
+    weight_array.InsertNextValue(weight)
+graph.GetEdgeData().AddArray(weight_array)
+print(f"AddEdge per edge: {time.perf_counter() - start:.2f} s")
+
+graph_source = EdgeArrayGraphSource()
+graph_source.SetEdges(sources, targets)
+graph_source.SetNumberOfVertices(n_vertices)
+graph_source.AddEdgeArray("Weight", weights)
+start = time.perf_counter()
+graph_source.Update()
+print(f"EdgeArrayGraphSource: {time.perf_counter() - start:.2f} s")
+
+offsets, neighbors, edge_ids = graph_source.GetCSR()
+print(f"Vertex 0 links to {neighbors[offsets[0]:offsets[1]]} "
+      f"through edges {edge_ids[offsets[0]:offsets[1]]}")
+
+# A random tree of 200,000 vertices: every vertex hangs below an earlier one.
+n = 200_000
+parents = (rng.random(n - 1) * np.arange(1, n)).astype(np.int64)
+large_tree = EdgeArrayGraphSource()
+large_tree.SetOutputTypeToTree()
+large_tree.SetEdges(parents, np.arange(1, n))
+start = time.perf_counter()
+large_tree.CheckTree()
+print(f"Tree check: {1000 * (time.perf_counter() - start):.1f} ms")
+
+# An invalid tree is rejected before any edge is added.
+cyclic = EdgeArrayGraphSource()
+cyclic.SetOutputTypeToTree()
+cyclic.SetEdges([0, 2, 3], [1, 3, 2])
+try:
+    cyclic.CheckTree()
+except ValueError as error:
+    print("Rejected:", error)
+
+# Create a themed graph layout view
+view = vtkGraphLayoutView()
+view.AddRepresentationFromInputConnection(tree_source.GetOutputPort())
+
+theme = vtkViewTheme.CreateMellowTheme()
+view.ApplyViewTheme(theme)
+
+view.SetVertexColorArrayName("VertexDegree")
+view.SetColorVertices(True)
+view.SetVertexLabelArrayName("Label")
+view.SetVertexLabelVisibility(True)
+
+view.GetRenderWindow().SetSize(800, 800)
+view.ResetCamera()
+view.Render()
+view.GetInteractor().Start()
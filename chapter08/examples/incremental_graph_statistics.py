@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""Vertex degree and graph statistics kept up to date as edges stream in.
+
+Feeds a random graph into a vtkMutableDirectedGraph in small batches while
+IncrementalGraphStatistics keeps the degree, in- and out-degree, connected
+component and edge-weight arrays current. The batch timings are compared
+with vtkVertexDegree and with recomputing the statistics from scratch,
+and the final degrees are checked against vtkVertexDegree.
+"""
+
+import time
+
+import numpy as np
+
+from vtkmodules.vtkCommonDataModel import vtkMutableDirectedGraph
+from vtkmodules.vtkInfovisCore import vtkVertexDegree
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+from vtkmodules.vtkViewsInfovis import vtkGraphLayoutView
+from vtkmodules.vtkViewsCore import vtkViewTheme
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+
+
+class IncrementalGraphStatistics:
+    """Maintains graph statistics while edges are added to a mutable graph.
+
+    Edges are added through AddEdges(), which appends them to the graph
+    and updates only the entries they touch, so a batch of k edges costs
+    O(k) whatever the size of the graph. The vertex data of the graph gets
+    "VertexDegree" (as computed by vtkVertexDegree), "InDegree" and
+    "OutDegree" (directed graphs only), "WeightedDegree" (the sum of the
+    incident edge weights) and "Component". The edge weights are stored in
+    the edge data under EdgeWeightArrayName ("edge weight").
+
+    Components are weakly connected components found with union-find.
+    "Component" holds the id of one vertex of the component, and when two
+    components merge the smaller one is relabeled, so each vertex is
+    relabeled at most log2(n) times over the whole stream.
+
+    The arrays live in NumPy buffers that grow by doubling and are handed
+    to the graph without copying. Vertices and edges added to the graph
+    directly are not seen; call Reset() to recompute from the graph.
+    """
+
+    def __init__(self, graph=None):
+        self._graph = vtkMutableDirectedGraph() if graph is None else graph
+        self._directed = self._graph.IsA("vtkDirectedGraph")
+        self._edge_weight_array_name = "edge weight"
+        self.Reset()
+
+    def GetGraph(self):
+        return self._graph
+
+    def SetEdgeWeightArrayName(self, name):
+        self._edge_weight_array_name = name
+        self.Reset()
+
+    def GetNumberOfComponents(self):
+        return self._number_of_components
+
+    def GetComponentSize(self, vertex):
+        return len(self._members[int(self._component[vertex])])
+
+    def GetEdgeWeightStatistics(self):
+        """Returns the count, sum, minimum, maximum, mean and variance."""
+        count = self._weight_count
+        return {
+            "count": count,
+            "sum": self._weight_sum,
+            "minimum": self._weight_min if count else None,
+            "maximum": self._weight_max if count else None,
+            "mean": self._weight_mean if count else None,
+            "variance": self._weight_m2 / count if count else None,
+        }
+
+    def Reset(self):
+        """Recomputes every statistic from the edges already in the graph."""
+        self._n = 0
+        self._m = 0
+        self._capacity = 0
+        self._edge_capacity = 0
+        self._degree = np.zeros(0, dtype=np.int32)
+        self._in_degree = np.zeros(0, dtype=np.int32)
+        self._out_degree = np.zeros(0, dtype=np.int32)
+        self._weighted_degree = np.zeros(0, dtype=np.float64)
+        self._component = np.zeros(0, dtype=np.int64)
+        self._weights = np.zeros(0, dtype=np.float64)
+        self._members = []
+        self._number_of_components = 0
+        self._weight_count = 0
+        self._weight_sum = 0.0
+        self._weight_mean = 0.0
+        self._weight_m2 = 0.0
+        self._weight_min = np.inf
+        self._weight_max = -np.inf
+
+        graph = self._graph
+        m = graph.GetNumberOfEdges()
+        sources = np.fromiter(map(graph.GetSourceVertex, range(m)), np.int64, m)
+        targets = np.fromiter(map(graph.GetTargetVertex, range(m)), np.int64, m)
+        array = graph.GetEdgeData().GetArray(self._edge_weight_array_name)
+        if array is None:
+            weights = np.zeros(m)
+        else:
+            weights = vtk_to_numpy(array).astype(np.float64)
+        self._add_vertices(graph.GetNumberOfVertices())
+        self._update(sources, targets, weights)
+        self._publish()
+
+    def AddEdges(self, sources, targets, weights=None):
+        """Adds edges sources[i] -> targets[i], creating missing vertices."""
+        sources = np.asarray(sources, dtype=np.int64).ravel()
+        targets = np.asarray(targets, dtype=np.int64).ravel()
+        if sources.shape != targets.shape:
+            raise ValueError("sources and targets must have the same length")
+        if weights is None:
+            weights = np.zeros(sources.size)
+        weights = np.asarray(weights, dtype=np.float64).ravel()
+        if weights.shape != sources.shape:
+            raise ValueError("weights must have one value per edge")
+        if sources.size == 0:
+            return
+        if min(sources.min(), targets.min()) < 0:
+            raise ValueError("vertex ids must not be negative")
+
+        n = int(max(sources.max(), targets.max())) + 1
+        for _ in range(self._graph.GetNumberOfVertices(), n):
+            self._graph.AddVertex()
+        self._add_vertices(n)
+        for source, target in zip(sources.tolist(), targets.tolist()):
+            self._graph.AddGraphEdge(source, target)
+        self._update(sources, targets, weights)
+        self._publish()
+
+    def _add_vertices(self, n):
+        """Grows the vertex buffers to n vertices, each its own component."""
+        if n <= self._n:
+            return
+        if n > self._capacity:
+            self._capacity = max(n, 2 * self._capacity, 16)
+            for name in ("_degree", "_in_degree", "_out_degree",
+                         "_weighted_degree", "_component"):
+                old = getattr(self, name)
+                new = np.zeros(self._capacity, dtype=old.dtype)
+                new[:old.size] = old
+                setattr(self, name, new)
+        new_vertices = range(self._n, n)
+        self._component[self._n:n] = new_vertices
+        self._members.extend([v] for v in new_vertices)
+        self._number_of_components += n - self._n
+        self._n = n
+
+    def _update(self, sources, targets, weights):
+        k = sources.size
+        if self._m + k > self._edge_capacity:
+            self._edge_capacity = max(self._m + k, 2 * self._edge_capacity, 16)
+            new = np.zeros(self._edge_capacity)
+            new[:self._m] = self._weights[:self._m]
+            self._weights = new
+        self._weights[self._m:self._m + k] = weights
+        self._m += k
+
+        # add.at only touches the entries of the batch, unlike bincount.
+        np.add.at(self._out_degree, sources, 1)
+        np.add.at(self._in_degree, targets, 1)
+        np.add.at(self._degree, sources, 1)
+        np.add.at(self._weighted_degree, sources, weights)
+        ends, end_weights = targets, weights
+        if not self._directed:
+            # An undirected self loop is a single incident edge.
+            far = sources != targets
+            ends, end_weights = targets[far], weights[far]
+        np.add.at(self._degree, ends, 1)
+        np.add.at(self._weighted_degree, ends, end_weights)
+
+        if k:
+            # Chan's update merges the batch mean and variance into the totals.
+            mean = float(weights.mean())
+            m2 = float(((weights - mean) ** 2).sum())
+            total = self._weight_count + k
+            delta = mean - self._weight_mean
+            self._weight_m2 += m2 + delta * delta * self._weight_count * k / total
+            self._weight_mean += delta * k / total
+            self._weight_count = total
+            self._weight_sum += float(weights.sum())
+            self._weight_min = min(self._weight_min, float(weights.min()))
+            self._weight_max = max(self._weight_max, float(weights.max()))
+
+        self._merge_components(sources, targets)
+
+    def _merge_components(self, sources, targets):
+        roots_a = self._component[sources]
+        roots_b = self._component[targets]
+        joining = roots_a != roots_b
+        if not joining.any():
+            return
+        # Union-find over the distinct components the batch joins, so the
+        # work depends on the batch rather than the graph.
+        roots, pairs = np.unique(np.concatenate([roots_a[joining], roots_b[joining]]),
+                                 return_inverse=True)
+        parent = list(range(roots.size))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        half = pairs.size // 2
+        for a, b in zip(pairs[:half].tolist(), pairs[half:].tolist()):
+            a, b = find(a), find(b)
+            if a != b:
+                parent[b] = a
+
+        groups = {}
+        for i, root in enumerate(roots.tolist()):
+            groups.setdefault(find(i), []).append(root)
+        for group in groups.values():
+            if len(group) < 2:
+                continue
+            # The largest component keeps its label; the others join it.
+            largest = max(group, key=lambda root: len(self._members[root]))
+            kept = self._members[largest]
+            for root in group:
+                if root != largest:
+                    moved = self._members[root]
+                    self._component[moved] = largest
+                    kept.extend(moved)
+                    self._members[root] = None
+            self._number_of_components -= len(group) - 1
+
+    def _publish(self):
+        """Hands views of the current buffers to the graph without copying."""
+        n = self._n
+        vertex_arrays = [("VertexDegree", self._degree),
+                         ("WeightedDegree", self._weighted_degree),
+                         ("Component", self._component)]
+        if self._directed:
+            vertex_arrays += [("InDegree", self._in_degree),
+                              ("OutDegree", self._out_degree)]
+        for name, values in vertex_arrays:
+            array = numpy_to_vtk(values[:n], deep=0)
+            array.SetName(name)
+            self._graph.GetVertexData().AddArray(array)
+        array = numpy_to_vtk(self._weights[:self._m], deep=0)
+        array.SetName(self._edge_weight_array_name)
+        self._graph.GetEdgeData().AddArray(array)
+        self._graph.Modified()
+
+
+# Stream 100 batches of 1,000 weighted edges among 50,000 vertices.
+rng = np.random.default_rng(0)
+n_vertices, batch_size, n_batches = 50_000, 1_000, 100
+stats = IncrementalGraphStatistics()
+batch_times = []
+for _ in range(n_batches):
+    sources = rng.integers(0, n_vertices, batch_size)
+    targets = rng.integers(0, n_vertices, batch_size)
+    start = time.perf_counter()
+    stats.AddEdges(sources, targets, rng.random(batch_size))
+    batch_times.append(time.perf_counter() - start)
+print(f"AddEdges, {batch_size} edges: first batch {1000 * batch_times[0]:.1f} ms "
+      f"(creates the vertices), last batch {1000 * batch_times[-1]:.1f} ms")
+
+graph = stats.GetGraph()
+degree = vtkVertexDegree()
+degree.SetInputData(graph)
+start = time.perf_counter()
+degree.Update()
+print(f"vtkVertexDegree on {graph.GetNumberOfEdges()} edges: "
+      f"{1000 * (time.perf_counter() - start):.1f} ms")
+expected = vtk_to_numpy(degree.GetOutput().GetVertexData().GetArray("VertexDegree"))
+actual = vtk_to_numpy(graph.GetVertexData().GetArray("VertexDegree"))
+print("Mismatched degrees:", int(np.count_nonzero(actual != expected)))
+
+# Recomputing every statistic reads all the edges back out of the graph.
+start = time.perf_counter()
+stats.Reset()
+print(f"Full recomputation: {1000 * (time.perf_counter() - start):.1f} ms")
+print("Components:", stats.GetNumberOfComponents())
+print("Edge weights:", {key: round(value, 4)
+                        for key, value in stats.GetEdgeWeightStatistics().items()})
+
+# A small graph built in four batches, labeled like vertex_degree.py
+small = IncrementalGraphStatistics()
+for _ in range(4):
+    small.AddEdges(rng.integers(0, 10, 4), rng.integers(0, 10, 4), rng.random(4))
+
+view = vtkGraphLayoutView()
+view.AddRepresentationFromInput(small.GetGraph())
+view.SetVertexLabelArrayName("VertexDegree")
+view.SetVertexLabelVisibility(True)
+view.SetVertexColorArrayName("Component")
+view.SetColorVertices(True)
+view.SetEdgeColorArrayName("edge weight")
+view.SetColorEdges(True)
+view.SetLayoutStrategyToSimple2D()
+
+# Apply a theme
+theme = vtkViewTheme.CreateMellowTheme()
+theme.SetLineWidth(4)
+view.ApplyViewTheme(theme)
+
+view.GetRenderWindow().SetSize(800, 800)
+view.ResetCamera()
+view.Render()
+view.GetInteractor().Start()
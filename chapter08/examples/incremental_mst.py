@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Minimum and maximum spanning forests that follow edge weight changes.
+
+Computes both spanning forests of a large random graph with Kruskal's
+algorithm in one update, then changes a few edge weights and updates
+again, which only re-sorts the changed edges. The timings are compared
+with vtkBoostKruskalMinimumSpanningTree, and the maximum spanning forest
+of the centrality graph from boost_mst.py is shown as a selection.
+
+Requires VTK built with Boost Graph Library support.
+"""
+
+import time
+
+import numpy as np
+
+from vtkmodules.vtkCommonCore import VTK_ID_TYPE
+from vtkmodules.vtkCommonDataModel import (
+    vtkGraph,
+    vtkSelection,
+    vtkSelectionNode,
+)
+from vtkmodules.vtkInfovisBoostGraphAlgorithms import (
+    vtkBoostBrandesCentrality,
+    vtkBoostKruskalMinimumSpanningTree,
+)
+from vtkmodules.vtkInfovisCore import vtkRandomGraphSource
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+from vtkmodules.util.vtkAlgorithm import VTKPythonAlgorithmBase
+from vtkmodules.vtkViewsInfovis import vtkGraphLayoutView
+from vtkmodules.vtkViewsCore import vtkViewTheme
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+
+
+def _kruskal(n, sources, targets, order, batch_size):
+    """Returns the ids of the spanning forest edges taken in the given order.
+
+    The edges are scanned in batches. At the start of a batch every vertex
+    knows the representative of its tree, so edges inside a tree are
+    dropped for the whole batch at once; only the remaining edges go
+    through a small union-find over the trees they touch.
+    """
+    root = np.arange(n)
+    size = np.ones(n, dtype=np.int64)
+    forest = []
+    for start in range(0, order.size, batch_size):
+        if len(forest) == n - 1:
+            break
+        edges = order[start:start + batch_size]
+        roots_a, roots_b = root[sources[edges]], root[targets[edges]]
+        joining = roots_a != roots_b
+        if not joining.any():
+            continue
+        edges, roots_a, roots_b = edges[joining], roots_a[joining], roots_b[joining]
+
+        # Union-find over the compact ids of the trees this batch touches.
+        trees, pairs = np.unique(np.concatenate([roots_a, roots_b]), return_inverse=True)
+        parent = list(range(trees.size))
+        weight = size[trees].tolist()
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        half = edges.size
+        for edge, a, b in zip(edges.tolist(), pairs[:half].tolist(), pairs[half:].tolist()):
+            a, b = find(a), find(b)
+            if a != b:
+                if weight[a] < weight[b]:
+                    a, b = b, a
+                parent[b] = a
+                weight[a] += weight[b]
+                forest.append(edge)
+
+        # Point every vertex of a merged tree at its new representative.
+        merged = np.array(parent)
+        while True:
+            jumped = merged[merged]
+            if np.array_equal(jumped, merged):
+                break
+            merged = jumped
+        remap = np.arange(n)
+        remap[trees] = trees[merged]
+        root = remap[root]
+        size[trees[merged]] = np.asarray(weight)[merged]
+    return np.array(forest, dtype=np.int64)
+
+
+class KruskalSpanningForests(VTKPythonAlgorithmBase):
+    """Minimum and maximum spanning forests with a persistent edge order.
+
+    Output port 0 is the minimum spanning forest and port 1 the maximum
+    spanning forest, both as vtkSelections of edge indices like the output
+    of vtkBoostKruskalMinimumSpanningTree. Edge directions are ignored.
+    Both forests come from one ordering of the edges by EdgeWeightArrayName
+    (the maximum forest scans it backwards), so one update computes both.
+
+    The ordering is kept between updates. When only weights changed, the
+    changed edges are taken out of the ordering, sorted among themselves
+    and merged back in, which avoids re-sorting every edge. The edge end
+    points are also kept while the graph structure stays the same.
+    """
+
+    def __init__(self):
+        super().__init__(
+            nInputPorts=1, inputType="vtkGraph",
+            nOutputPorts=2, outputType="vtkSelection",
+        )
+        self._edge_weight_array_name = "edge weight"
+        self._batch_size = 1 << 15
+        self._structure = None
+        self._sources = None
+        self._targets = None
+        self._weights = None
+        self._order = None
+        self._last_update = None
+
+    def SetEdgeWeightArrayName(self, name):
+        self._edge_weight_array_name = name
+        self._order = None
+        self.Modified()
+
+    def SetBatchSize(self, size):
+        self._batch_size = max(1, int(size))
+        self.Modified()
+
+    def GetLastUpdate(self):
+        """Returns how the edge ordering was last brought up to date."""
+        return self._last_update
+
+    def _edges(self, graph):
+        if self._structure is None or not self._structure.IsSameStructure(graph):
+            m = graph.GetNumberOfEdges()
+            self._sources = np.fromiter(map(graph.GetSourceVertex, range(m)), np.int64, m)
+            self._targets = np.fromiter(map(graph.GetTargetVertex, range(m)), np.int64, m)
+            self._structure = graph.NewInstance()
+            self._structure.ShallowCopy(graph)
+            self._order = None
+        return self._sources, self._targets
+
+    def _sort(self, weights):
+        """Brings the ascending edge order up to date with the weights."""
+        if self._order is None:
+            self._order = np.argsort(weights, kind="stable")
+            self._last_update = "full sort"
+        else:
+            changed = np.flatnonzero(weights != self._weights)
+            if changed.size == 0:
+                self._last_update = "unchanged"
+            elif changed.size > weights.size // 16:
+                self._order = np.argsort(weights, kind="stable")
+                self._last_update = "full sort"
+            else:
+                moved = np.zeros(weights.size, dtype=bool)
+                moved[changed] = True
+                kept = self._order[~moved[self._order]]
+                changed = changed[np.argsort(weights[changed], kind="stable")]
+                slots = np.searchsorted(weights[kept], weights[changed], side="right")
+                self._order = np.insert(kept, slots, changed)
+                self._last_update = f"merged {changed.size} changed edges"
+        self._weights = weights
+        return self._order
+
+    def RequestData(self, request, inInfo, outInfo):
+        graph = vtkGraph.GetData(inInfo[0])
+        array = graph.GetEdgeData().GetArray(self._edge_weight_array_name)
+        if array is None:
+            raise ValueError(f"no edge array named {self._edge_weight_array_name!r}")
+        sources, targets = self._edges(graph)
+        order = self._sort(vtk_to_numpy(array).astype(np.float64))
+
+        n = graph.GetNumberOfVertices()
+        forests = (_kruskal(n, sources, targets, order, self._batch_size),
+                   _kruskal(n, sources, targets, order[::-1], self._batch_size))
+        for port, forest in enumerate(forests):
+            node = vtkSelectionNode()
+            node.SetFieldType(vtkSelectionNode.EDGE)
+            node.SetContentType(vtkSelectionNode.INDICES)
+            node.SetSelectionList(numpy_to_vtk(np.sort(forest), deep=1,
+                                               array_type=VTK_ID_TYPE))
+            output = vtkSelection.GetData(outInfo, port)
+            output.Initialize()
+            output.AddNode(node)
+        return 1
+
+
+def forest_weight(selection, weights):
+    ids = vtk_to_numpy(selection.GetNode(0).GetSelectionList())
+    return weights[ids].sum(), ids.size
+
+
+# A random undirected graph with 100,000 vertices and 400,000 weighted edges
+large = vtkRandomGraphSource()
+large.DirectedOff()
+large.SetNumberOfVertices(100000)
+large.SetNumberOfEdges(400000)
+large.SetIncludeEdgeWeights(True)
+large.Update()
+graph = large.GetOutput()
+weights = vtk_to_numpy(graph.GetEdgeData().GetArray("edge weight"))
+
+forests = KruskalSpanningForests()
+forests.SetInputDataObject(0, graph)
+kruskal = vtkBoostKruskalMinimumSpanningTree()
+kruskal.SetInputData(graph)
+kruskal.SetEdgeWeightArrayName("edge weight")
+
+rng = np.random.default_rng(0)
+for step in range(3):
+    if step:
+        # Change the weights of 100 edges.
+        changed = rng.choice(weights.size, 100, replace=False)
+        weights[changed] = rng.random(100)
+        graph.GetEdgeData().GetArray("edge weight").Modified()
+        graph.Modified()
+    start = time.perf_counter()
+    forests.Update()
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    kruskal.Modified()
+    kruskal.Update()
+    boost_elapsed = time.perf_counter() - start
+    total, count = forest_weight(forests.GetOutputDataObject(0), weights)
+    boost_total, _ = forest_weight(kruskal.GetOutput(), weights)
+    print(f"Update {step} ({forests.GetLastUpdate()}): {elapsed:.2f} s for both "
+          f"forests, vtkBoostKruskalMinimumSpanningTree {boost_elapsed:.2f} s; "
+          f"{count} edges, weight {total:.4f} (Boost {boost_total:.4f})")
+
+# The centrality graph from boost_mst.py
+source = vtkRandomGraphSource()
+source.DirectedOff()
+source.SetNumberOfVertices(50)
+source.SetEdgeProbability(0.01)
+source.SetUseEdgeProbability(True)
+source.AllowParallelEdgesOn()
+source.AllowSelfLoopsOn()
+source.SetStartWithTree(True)
+
+centrality = vtkBoostBrandesCentrality()
+centrality.SetInputConnection(source.GetOutputPort())
+
+# Port 1 is the maximal spanning tree that NegateEdgeWeightsOn() gives.
+centrality_forests = KruskalSpanningForests()
+centrality_forests.SetInputConnection(centrality.GetOutputPort())
+centrality_forests.SetEdgeWeightArrayName("centrality")
+centrality_forests.Update()
+
+view = vtkGraphLayoutView()
+view.AddRepresentationFromInputConnection(centrality.GetOutputPort())
+view.SetVertexLabelArrayName("centrality")
+view.SetVertexLabelVisibility(True)
+view.SetVertexColorArrayName("centrality")
+view.SetColorVertices(True)
+view.SetEdgeColorArrayName("centrality")
+view.SetColorEdges(True)
+view.SetLayoutStrategyToSimple2D()
+
+rep = view.GetRepresentation(0)
+rep.SetSelectionType(2)
+rep.GetAnnotationLink().SetCurrentSelection(centrality_forests.GetOutputDataObject(1))
+
+theme = vtkViewTheme.CreateMellowTheme()
+theme.SetLineWidth(5)
+theme.SetCellOpacity(0.99)
+theme.SetPointSize(10)
+theme.SetSelectedCellColor(1, 0, 1)
+theme.SetSelectedPointColor(1, 0, 1)
+view.ApplyViewTheme(theme)
+view.SetVertexLabelFontSize(14)
+
+view.GetRenderWindow().SetSize(800, 800)
+view.ResetCamera()
+view.Render()
+view.GetInteractor().Start()
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""Multilevel force-directed layout of a large graph.
+
+Lays out a random graph with 10,000 vertices by repeatedly coarsening it,
+placing the coarsest graph first and refining the positions level by
+level, with a Barnes-Hut quadtree for the repulsive forces. The layout
+runs on a background thread and the view shows the positions as they
+improve.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkDataObject, vtkGraph
+from vtkmodules.vtkInfovisCore import vtkRandomGraphSource
+from vtkmodules.util.numpy_support import numpy_to_vtk
+from vtkmodules.util.vtkAlgorithm import VTKPythonAlgorithmBase
+from vtkmodules.vtkViewsInfovis import vtkGraphLayoutView
+from vtkmodules.vtkViewsCore import vtkViewTheme
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+
+
+def _spread_bits(x):
+    """Moves bit i of each 16-bit value to bit 2i."""
+    x = x & 0xFFFF
+    x = (x | (x << 8)) & 0x00FF00FF
+    x = (x | (x << 4)) & 0x0F0F0F0F
+    x = (x | (x << 2)) & 0x33333333
+    return (x | (x << 1)) & 0x55555555
+
+
+def _repulsion(pos, mass, theta):
+    """Barnes-Hut approximation of sum_j m_i m_j (x_i - x_j) / |x_i - x_j|^2.
+
+    The quadtree is a linear one: sorting the vertices by the Morton code
+    of their grid cell makes every quadtree cell a contiguous run of
+    vertices at every depth. The traversal keeps a list of (vertex, cell)
+    pairs and moves down one depth at a time, accepting the cells that are
+    small enough as seen from the vertex and replacing the others by their
+    children. Vertices in finest cells that are still too close are summed
+    one by one.
+    """
+    n = len(pos)
+    depth = int(np.clip(np.ceil(np.log2(max(n, 2)) / 2) + 1, 2, 16))
+    lo = pos.min(axis=0)
+    size = max(float((pos.max(axis=0) - lo).max()), 1e-9) * (1 + 1e-9)
+    grid = np.minimum(((pos - lo) * ((1 << depth) / size)).astype(np.int64),
+                      (1 << depth) - 1)
+    codes = _spread_bits(grid[:, 0]) | (_spread_bits(grid[:, 1]) << 1)
+    order = np.argsort(codes, kind="stable")
+    codes, pos, mass = codes[order], pos[order], mass[order]
+    weighted = pos * mass[:, None]
+
+    levels = []
+    for level in range(depth + 1):
+        keys = codes >> (2 * (depth - level))
+        first = np.empty(n, dtype=bool)
+        first[0] = True
+        np.not_equal(keys[1:], keys[:-1], out=first[1:])
+        starts = np.flatnonzero(first)
+        cell_mass = np.add.reduceat(mass, starts)
+        center = np.add.reduceat(weighted, starts) / cell_mass[:, None]
+        levels.append((np.cumsum(first) - 1, starts, cell_mass, center))
+
+    force = np.zeros((n, 2))
+    theta2 = theta * theta
+    bodies = np.arange(n)
+    cells = np.zeros(n, dtype=np.int64)
+    for level, (cell_of, starts, cell_mass, center) in enumerate(levels):
+        delta = pos[bodies] - center[cells]
+        dist2 = np.einsum("ij,ij->i", delta, delta) + 1e-12
+        own = cell_of[bodies] == cells
+        side = size / (1 << level)
+        accept = ~own & (side * side < theta2 * dist2)
+        scale = cell_mass[cells[accept]] / dist2[accept]
+        for axis in range(2):
+            force[:, axis] += np.bincount(bodies[accept], delta[accept, axis] * scale,
+                                          minlength=n)
+        bodies, cells = bodies[~accept], cells[~accept]
+        if level == depth:
+            # Finest cells that are too close are summed vertex by vertex.
+            ends = np.append(starts[1:], n)
+            counts = ends[cells] - starts[cells]
+            stops = np.cumsum(counts)
+            others = (np.arange(stops[-1] if stops.size else 0)
+                      - np.repeat(stops - counts, counts) + np.repeat(starts[cells], counts))
+            bodies = np.repeat(bodies, counts)
+            distinct = others != bodies
+            bodies, others = bodies[distinct], others[distinct]
+            delta = pos[bodies] - pos[others]
+            scale = mass[others] / (np.einsum("ij,ij->i", delta, delta) + 1e-12)
+            for axis in range(2):
+                force[:, axis] += np.bincount(bodies, delta[:, axis] * scale, minlength=n)
+            break
+        # Open the other cells: their children are a contiguous run of
+        # cells one level down.
+        next_cell_of = levels[level + 1][0]
+        child_start = next_cell_of[starts]
+        child_end = np.append(child_start[1:], next_cell_of[-1] + 1)
+        counts = child_end[cells] - child_start[cells]
+        ends = np.cumsum(counts)
+        cells = (np.arange(ends[-1] if ends.size else 0) - np.repeat(ends - counts, counts)
+                 + np.repeat(child_start[cells], counts))
+        bodies = np.repeat(bodies, counts)
+
+    result = np.empty_like(force)
+    result[order] = force * mass[:, None]
+    return result
+
+
+def _coarsen(n, sources, targets, weights, rng):
+    """Merges the end points of a random matching of the edges.
+
+    Each round gives every edge a random priority and matches the edges
+    that have the lowest priority at both of their end points. Returns the
+    map from fine to coarse vertices and the merged coarse edges.
+    """
+    matched = np.zeros(n, dtype=bool)
+    partner = np.arange(n)
+    for _ in range(3):
+        free = ~matched[sources] & ~matched[targets]
+        if not free.any():
+            break
+        edge_ids = np.flatnonzero(free)
+        priority = rng.random(edge_ids.size)
+        lowest = np.full(n, np.inf)
+        np.minimum.at(lowest, sources[edge_ids], priority)
+        np.minimum.at(lowest, targets[edge_ids], priority)
+        chosen = ((lowest[sources[edge_ids]] == priority)
+                  & (lowest[targets[edge_ids]] == priority))
+        a, b = sources[edge_ids[chosen]], targets[edge_ids[chosen]]
+        partner[a], partner[b] = b, a
+        matched[a] = matched[b] = True
+
+    # Each matched pair is named after its smaller vertex.
+    representative = np.minimum(np.arange(n), partner)
+    roots, coarse = np.unique(representative, return_inverse=True)
+    nc = roots.size
+    cs, ct = coarse[sources], coarse[targets]
+    keep = cs != ct
+    cs, ct = np.minimum(cs[keep], ct[keep]), np.maximum(cs[keep], ct[keep])
+    keys, inverse = np.unique(cs * nc + ct, return_inverse=True)
+    merged = np.bincount(inverse, weights[keep], minlength=keys.size)
+    return coarse, nc, keys // nc, keys % nc, merged
+
+
+class MultilevelBarnesHutLayout(VTKPythonAlgorithmBase):
+    """Force-directed graph layout with coarsening and Barnes-Hut forces.
+
+    The graph is coarsened by merging matched pairs of vertices until it
+    has at most CoarsestSize vertices or stops shrinking. The coarsest
+    graph is laid out from random positions, and each finer level starts
+    from the positions of the level above. Vertices repel each other in
+    proportion to the number of original vertices they stand for, using a
+    quadtree to group distant vertices (Theta trades accuracy for speed),
+    and edges pull their end points together. Each level runs
+    IterationsPerLevel steps with an adaptive step length.
+
+    The output is the input graph with 2D points and can be shown in a
+    vtkGraphLayoutView with the pass-through layout strategy. With
+    BackgroundOn() the layout runs on a separate thread: each update
+    returns the most recent positions, and PollPositions() reports when
+    newer ones are available. The thread only uses NumPy, so the view
+    stays responsive while it runs.
+    """
+
+    def __init__(self):
+        super().__init__(
+            nInputPorts=1, inputType="vtkGraph",
+            nOutputPorts=1, outputType="vtkGraph",
+        )
+        self._iterations_per_level = 30
+        self._coarsest_size = 50
+        self._theta = 1.2
+        self._random_seed = 0
+        self._background = False
+        self._input_key = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._positions = None
+        self._generation = 0
+        self._shown_generation = 0
+
+    def SetIterationsPerLevel(self, iterations):
+        self._iterations_per_level = int(iterations)
+        self.Modified()
+
+    def SetCoarsestSize(self, size):
+        self._coarsest_size = max(2, int(size))
+        self.Modified()
+
+    def SetTheta(self, theta):
+        self._theta = float(theta)
+        self.Modified()
+
+    def SetRandomSeed(self, seed):
+        self._random_seed = seed
+        self.Modified()
+
+    def SetBackground(self, background):
+        self._background = bool(background)
+        self.Modified()
+
+    def BackgroundOn(self):
+        self.SetBackground(True)
+
+    def BackgroundOff(self):
+        self.SetBackground(False)
+
+    def IsRunning(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def StopLayout(self):
+        """Stops a background layout, keeping the latest positions."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def PollPositions(self):
+        """Marks the filter modified if the layout has newer positions.
+
+        Call this from the thread that updates the pipeline, for example
+        in a timer callback; returns True when the view should re-render.
+        """
+        if self._generation == self._shown_generation:
+            return False
+        self.Modified()
+        return True
+
+    def _publish(self, positions, to_level):
+        """Makes positions at a coarse level the latest vertex positions."""
+        self._positions = positions[to_level]
+        self._generation += 1
+
+    def _layout(self, n, sources, targets):
+        if n == 0:
+            return
+        rng = np.random.default_rng(self._random_seed)
+        weights = np.ones(sources.size)
+        mass = np.ones(n)
+        to_level = np.arange(n)
+        levels = [(mass, sources, targets, weights, to_level)]
+        maps = []
+        while n > self._coarsest_size:
+            coarse, nc, cs, ct, cw = _coarsen(n, sources, targets, weights, rng)
+            if nc > 0.9 * n:
+                break
+            mass = np.bincount(coarse, mass, minlength=nc)
+            to_level = coarse[to_level]
+            n, sources, targets, weights = nc, cs, ct, cw
+            levels.append((mass, sources, targets, weights, to_level))
+            maps.append(coarse)
+
+        positions = rng.random((n, 2)) * np.sqrt(mass.sum())
+        step = np.sqrt(mass.sum()) / 10
+        for i in reversed(range(len(levels))):
+            mass, sources, targets, weights, to_level = levels[i]
+            if i < len(maps):
+                # Matched vertices start from the position of their pair.
+                positions = positions[maps[i]] + rng.normal(0, 0.1, (maps[i].size, 2))
+            positions, step = self._refine(positions, mass, sources, targets,
+                                           weights, step, to_level)
+            if self._stop.is_set():
+                break
+            self._publish(positions, to_level)
+
+    def _refine(self, positions, mass, sources, targets, weights, step, to_level):
+        """Force-directed iterations at one level, with unit edge length."""
+        n = len(positions)
+        energy = np.inf
+        progress = 0
+        for iteration in range(self._iterations_per_level):
+            if self._stop.is_set():
+                break
+            force = _repulsion(positions, mass, self._theta)
+            delta = positions[targets] - positions[sources]
+            pull = np.hypot(delta[:, 0], delta[:, 1]) * weights
+            for axis in range(2):
+                along = delta[:, axis] * pull
+                force[:, axis] += (np.bincount(sources, along, minlength=n)
+                                   - np.bincount(targets, along, minlength=n))
+            length = np.hypot(force[:, 0], force[:, 1])
+            positions = positions + step * force / (length[:, None] + 1e-12)
+
+            # Adaptive cooling: shrink the step when the energy rises and
+            # grow it again after five improvements in a row.
+            previous, energy = energy, float((length * length).sum())
+            if energy < previous:
+                progress += 1
+                if progress >= 5:
+                    progress = 0
+                    step /= 0.9
+            else:
+                progress = 0
+                step *= 0.9
+            if self._background and iteration % 10 == 9:
+                self._publish(positions, to_level)
+        return positions, step
+
+    def RequestDataObject(self, request, inInfo, outInfo):
+        graph = vtkGraph.GetData(inInfo[0])
+        out_info = outInfo.GetInformationObject(0)
+        output = out_info.Get(vtkDataObject.DATA_OBJECT())
+        if output is None or output.GetClassName() != graph.GetClassName():
+            out_info.Set(vtkDataObject.DATA_OBJECT(), graph.NewInstance())
+        return 1
+
+    def RequestData(self, request, inInfo, outInfo):
+        graph = vtkGraph.GetData(inInfo[0])
+        output = vtkGraph.GetData(outInfo)
+        output.ShallowCopy(graph)
+
+        n = graph.GetNumberOfVertices()
+        key = (graph.GetMTime(), self._iterations_per_level, self._coarsest_size,
+               self._theta, self._random_seed, self._background)
+        if key != self._input_key:
+            self.StopLayout()
+            self._stop.clear()
+            self._input_key = key
+            m = graph.GetNumberOfEdges()
+            sources = np.fromiter(map(graph.GetSourceVertex, range(m)), np.int64, m)
+            targets = np.fromiter(map(graph.GetTargetVertex, range(m)), np.int64, m)
+            loops = sources == targets
+            sources, targets = sources[~loops], targets[~loops]
+            self._positions = np.zeros((n, 2))
+            if self._background:
+                self._thread = threading.Thread(
+                    target=self._layout, args=(n, sources, targets), daemon=True)
+                self._thread.start()
+            else:
+                self._layout(n, sources, targets)
+        self._shown_generation = self._generation
+
+        coordinates = np.zeros((n, 3))
+        coordinates[:, :2] = self._positions
+        points = vtkPoints()
+        points.SetData(numpy_to_vtk(coordinates, deep=1))
+        output.SetPoints(points)
+        return 1
+
+
+# A random graph with 10,000 vertices and 15,000 edges besides its
+# spanning tree
+source = vtkRandomGraphSource()
+source.SetNumberOfVertices(10000)
+source.SetNumberOfEdges(15000)
+source.SetStartWithTree(True)
+
+layout = MultilevelBarnesHutLayout()
+layout.SetInputConnection(source.GetOutputPort())
+start = time.perf_counter()
+layout.Update()
+print(f"MultilevelBarnesHutLayout, 10000 vertices: {time.perf_counter() - start:.1f} s")
+
+# Lay out the same graph again on a background thread and watch it settle.
+layout.SetRandomSeed(1)
+layout.BackgroundOn()
+
+view = vtkGraphLayoutView()
+view.AddRepresentationFromInputConnection(layout.GetOutputPort())
+view.SetLayoutStrategyToPassThrough()
+
+theme = vtkViewTheme.CreateMellowTheme()
+theme.SetPointSize(3)
+theme.SetLineWidth(1)
+view.ApplyViewTheme(theme)
+
+view.GetRenderWindow().SetSize(800, 800)
+view.ResetCamera()
+view.Render()
+
+
+def refresh(obj, event):
+    if layout.PollPositions():
+        view.ResetCamera()
+        view.Render()
+
+
+interactor = view.GetInteractor()
+interactor.AddObserver("TimerEvent", refresh)
+interactor.CreateRepeatingTimer(100)
+interactor.Start()
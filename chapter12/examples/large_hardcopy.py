@@ -0,0 +1,413 @@
+#!/usr/bin/env python
+"""High-resolution hardcopy rendered in tiles by a pool of worker processes.
+
+vtkRenderLargeImage renders the tiles of a large image one after another
+in a single window and assembles the whole image in memory before it is
+written. TiledHardcopy gives the tiles to worker processes instead. Each
+worker builds the scene once from the same scene function and renders its
+tiles offscreen, with an overlap that is cropped off, so that anti-aliased
+edges match across tile borders. The tiles are streamed into the file as
+they arrive: a PNG file is written one band of tiles at a time and a TIFF
+file is written as a tiled TIFF, one tile at a time. Only a band of tiles
+and the tiles in flight are ever held in memory.
+"""
+
+import math
+import os
+import resource
+import struct
+import tempfile
+import time
+import zlib
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+
+from vtkmodules.util.numpy_support import vtk_to_numpy
+from vtkmodules.vtkFiltersCore import (
+    vtkStructuredGridOutlineFilter,
+    vtkTubeFilter,
+)
+from vtkmodules.vtkFiltersFlowPaths import vtkStreamTracer
+from vtkmodules.vtkFiltersGeometry import vtkStructuredGridGeometryFilter
+from vtkmodules.vtkFiltersHybrid import vtkRenderLargeImage
+from vtkmodules.vtkFiltersSources import vtkPointSource
+from vtkmodules.vtkIOImage import vtkPNGWriter
+from vtkmodules.vtkIOLegacy import vtkStructuredGridReader
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderWindow,
+    vtkRenderer,
+    vtkWindowToImageFilter,
+)
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "..", "..", "chapter05", "data")
+
+
+def office_scene():
+    """Returns a renderer with the streamtubes of office_tubes.py."""
+    reader = vtkStructuredGridReader()
+    reader.SetFileName(os.path.join(data_dir, "office.binary.vtk"))
+    reader.Update()
+
+    seeds = vtkPointSource()
+    seeds.SetRadius(0.15)
+    seeds.SetCenter(0.1, 2.1, 0.5)
+    seeds.SetNumberOfPoints(6)
+
+    streamer = vtkStreamTracer()
+    streamer.SetInputConnection(reader.GetOutputPort())
+    streamer.SetSourceConnection(seeds.GetOutputPort())
+    streamer.SetMaximumPropagation(500)
+    streamer.SetInitialIntegrationStep(0.05)
+    streamer.SetIntegrationStepUnit(streamer.CELL_LENGTH_UNIT)
+    streamer.SetIntegrationDirectionToBoth()
+    streamer.SetIntegratorTypeToRungeKutta4()
+
+    stream_tube = vtkTubeFilter()
+    stream_tube.SetInputConnection(streamer.GetOutputPort())
+    stream_tube.SetRadius(0.02)
+    stream_tube.SetNumberOfSides(12)
+    stream_tube.SetVaryRadiusToVaryRadiusByVector()
+
+    map_stream_tube = vtkPolyDataMapper()
+    map_stream_tube.SetInputConnection(stream_tube.GetOutputPort())
+    map_stream_tube.SetScalarRange(
+        reader.GetOutput().GetPointData().GetScalars().GetRange()
+    )
+    stream_tube_actor = vtkActor()
+    stream_tube_actor.SetMapper(map_stream_tube)
+    stream_tube_actor.GetProperty().BackfaceCullingOn()
+
+    renderer = vtkRenderer()
+    renderer.AddActor(stream_tube_actor)
+    renderer.SetBackground(0.4, 0.4, 0.5)
+
+    furniture_color = (0.59, 0.427, 0.392)
+    shelf_color = (0.8, 0.8, 0.6)
+    pieces = [
+        ((11, 15, 7, 9, 8, 8), furniture_color),
+        ((11, 15, 10, 12, 8, 8), furniture_color),
+        ((15, 15, 7, 9, 0, 8), shelf_color),
+        ((15, 15, 10, 12, 0, 8), shelf_color),
+        ((13, 13, 0, 4, 0, 11), shelf_color),
+        ((20, 20, 0, 4, 0, 11), shelf_color),
+        ((13, 20, 0, 0, 0, 11), shelf_color),
+        ((13, 20, 4, 4, 0, 11), shelf_color),
+        ((13, 20, 0, 4, 0, 0), shelf_color),
+        ((13, 20, 0, 4, 11, 11), shelf_color),
+        ((13, 13, 15, 19, 0, 11), shelf_color),
+        ((20, 20, 15, 19, 0, 11), shelf_color),
+        ((13, 20, 15, 15, 0, 11), shelf_color),
+        ((13, 20, 19, 19, 0, 11), shelf_color),
+        ((13, 20, 15, 19, 0, 0), shelf_color),
+        ((13, 20, 15, 19, 11, 11), shelf_color),
+        ((20, 20, 6, 13, 10, 13), (0.3, 0.3, 0.5)),
+        ((0, 0, 9, 10, 14, 16), (0, 0, 0)),
+        ((0, 0, 9, 10, 0, 6), (0, 0, 0)),
+    ]
+    for extent, color in pieces:
+        geometry = vtkStructuredGridGeometryFilter()
+        geometry.SetInputConnection(reader.GetOutputPort())
+        geometry.SetExtent(*extent)
+        mapper = vtkPolyDataMapper()
+        mapper.SetInputConnection(geometry.GetOutputPort())
+        mapper.ScalarVisibilityOff()
+        actor = vtkActor()
+        actor.SetMapper(mapper)
+        actor.GetProperty().SetColor(*color)
+        renderer.AddActor(actor)
+
+    outline = vtkStructuredGridOutlineFilter()
+    outline.SetInputConnection(reader.GetOutputPort())
+    map_outline = vtkPolyDataMapper()
+    map_outline.SetInputConnection(outline.GetOutputPort())
+    outline_actor = vtkActor()
+    outline_actor.SetMapper(map_outline)
+    outline_actor.GetProperty().SetColor(0, 0, 0)
+    renderer.AddActor(outline_actor)
+
+    camera = renderer.GetActiveCamera()
+    camera.SetClippingRange(0.726079, 36.3039)
+    camera.SetFocalPoint(2.43584, 2.15046, 1.11104)
+    camera.SetPosition(-4.76183, -10.4426, 3.17203)
+    camera.SetViewUp(0.0511273, 0.132773, 0.989827)
+    camera.SetViewAngle(18.604)
+    camera.Zoom(1.2)
+    return renderer
+
+
+class PNGStreamWriter:
+    """Writes an 8-bit RGB PNG file from rows given top to bottom.
+
+    The rows are compressed as they come, so the image never has to be
+    in memory as a whole.
+    """
+
+    def __init__(self, filename, width, height):
+        self._file = open(filename, "wb")
+        self._width = width
+        self._rows_left = height
+        self._compressor = zlib.compressobj(6)
+        self._file.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def _chunk(self, kind, data):
+        self._file.write(struct.pack(">I", len(data)) + kind + data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+    def write_rows(self, rows):
+        """Appends an (n, width, 3) uint8 array of rows."""
+        if rows.shape[1:] != (self._width, 3) or rows.shape[0] > self._rows_left:
+            raise ValueError(f"rows of shape {rows.shape} do not fit the image")
+        self._rows_left -= rows.shape[0]
+        # Every scanline starts with its filter type, 0 for none.
+        lines = np.zeros((rows.shape[0], 1 + 3 * self._width), dtype=np.uint8)
+        lines[:, 1:] = rows.reshape(rows.shape[0], -1)
+        data = self._compressor.compress(lines.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+
+    def close(self):
+        if self._rows_left:
+            raise ValueError(f"{self._rows_left} rows were never written")
+        self._chunk(b"IDAT", self._compressor.flush())
+        self._chunk(b"IEND", b"")
+        self._file.close()
+
+
+class TiledTIFFWriter:
+    """Writes an 8-bit RGB tiled TIFF file, one tile at a time.
+
+    Tiles may be written in any order. Each one is deflate compressed
+    and written at the end of the file; the directory that locates them
+    is written by close(). The tile size must be a multiple of 16, and
+    the tiles on the right and bottom edges are padded to the full size.
+    """
+
+    def __init__(self, filename, width, height, tile_size):
+        if tile_size % 16:
+            raise ValueError("the TIFF tile size must be a multiple of 16")
+        self._file = open(filename, "wb")
+        self._width = width
+        self._height = height
+        self._tile_size = tile_size
+        self._across = math.ceil(width / tile_size)
+        count = self._across * math.ceil(height / tile_size)
+        self._offsets = [0] * count
+        self._byte_counts = [0] * count
+        # Header with the directory offset filled in by close().
+        self._file.write(b"II*\x00\x00\x00\x00\x00")
+
+    def write_tile(self, column, row, pixels):
+        """Writes the (h, w, 3) uint8 tile at the given tile column and row."""
+        size = self._tile_size
+        tile = np.zeros((size, size, 3), dtype=np.uint8)
+        tile[:pixels.shape[0], :pixels.shape[1]] = pixels
+        data = zlib.compress(tile.tobytes(), 6)
+        index = row * self._across + column
+        self._offsets[index] = self._file.tell()
+        self._byte_counts[index] = len(data)
+        self._file.write(data)
+        if self._file.tell() >= 2 ** 32:
+            raise ValueError("the image is too large for a classic TIFF file")
+
+    def close(self):
+        if not all(self._offsets):
+            raise ValueError("some tiles were never written")
+        count = len(self._offsets)
+        # The arrays that do not fit in a directory entry go before it.
+        if self._file.tell() % 2:
+            self._file.write(b"\x00")
+        bits_offset = self._file.tell()
+        self._file.write(struct.pack("<3H", 8, 8, 8))
+        offsets_offset = self._file.tell()
+        self._file.write(struct.pack(f"<{count}I", *self._offsets))
+        counts_offset = self._file.tell()
+        self._file.write(struct.pack(f"<{count}I", *self._byte_counts))
+
+        def entry(tag, kind, values_count, value):
+            # kind 3 is SHORT, 4 is LONG; short values are left aligned.
+            if kind == 3 and values_count == 1:
+                return struct.pack("<HHIHH", tag, kind, values_count, value, 0)
+            return struct.pack("<HHII", tag, kind, values_count, value)
+
+        entries = [
+            entry(256, 4, 1, self._width),
+            entry(257, 4, 1, self._height),
+            entry(258, 3, 3, bits_offset),
+            entry(259, 3, 1, 8),  # Adobe deflate
+            entry(262, 3, 1, 2),  # RGB
+            entry(277, 3, 1, 3),
+            entry(284, 3, 1, 1),  # chunky
+            entry(322, 4, 1, self._tile_size),
+            entry(323, 4, 1, self._tile_size),
+            entry(324, 4, count, offsets_offset if count > 1 else self._offsets[0]),
+            entry(325, 4, count, counts_offset if count > 1 else self._byte_counts[0]),
+        ]
+        directory_offset = self._file.tell()
+        self._file.write(struct.pack("<H", len(entries)) + b"".join(entries))
+        self._file.write(struct.pack("<I", 0))
+        self._file.seek(4)
+        self._file.write(struct.pack("<I", directory_offset))
+        self._file.close()
+
+
+_worker = {}
+
+
+def _start_worker(scene, window_size):
+    """Pool initializer: builds the scene in an offscreen window."""
+    renderer = scene()
+    render_window = vtkRenderWindow()
+    render_window.OffScreenRenderingOn()
+    render_window.AddRenderer(renderer)
+    render_window.SetSize(window_size, window_size)
+    grabber = vtkWindowToImageFilter()
+    grabber.SetInput(render_window)
+    grabber.SetInputBufferTypeToRGB()
+    grabber.ReadFrontBufferOff()
+    camera = renderer.GetActiveCamera()
+    _worker.update(
+        render_window=render_window,
+        grabber=grabber,
+        camera=camera,
+        view_angle=camera.GetViewAngle(),
+        parallel_scale=camera.GetParallelScale(),
+        window_center=camera.GetWindowCenter(),
+    )
+
+
+def _render_tile(task):
+    """Renders one tile and returns (column, row, pixels) with the rows top down."""
+    column, row, x, y, width, height, image_width, image_height, overlap = task
+    size = _worker["render_window"].GetSize()[0]
+    camera = _worker["camera"]
+
+    # The window covers the image pixels [x0, x0 + size) x [y0, y0 + size),
+    # counted from the lower left corner, so that the tile has a margin of
+    # overlap pixels on every side. Narrow the view to that square, then
+    # move the window center onto it.
+    x0 = x - overlap
+    y0 = image_height - y - height - overlap
+    scale = size / image_height
+    half_angle = math.radians(_worker["view_angle"]) / 2
+    camera.SetViewAngle(math.degrees(2 * math.atan(math.tan(half_angle) * scale)))
+    camera.SetParallelScale(_worker["parallel_scale"] * scale)
+    center_x, center_y = _worker["window_center"]
+    camera.SetWindowCenter(
+        (center_x - 1 + (2 * x0 + size) / image_width) * image_width / size,
+        (center_y - 1 + (2 * y0 + size) / image_height) * image_height / size,
+    )
+
+    grabber = _worker["grabber"]
+    _worker["render_window"].Render()
+    grabber.Modified()
+    grabber.Update()
+    pixels = vtk_to_numpy(grabber.GetOutput().GetPointData().GetScalars())
+    pixels = pixels.reshape(size, size, 3)
+    tile = pixels[overlap:overlap + height, overlap:overlap + width][::-1]
+    return column, row, np.ascontiguousarray(tile)
+
+
+class TiledHardcopy:
+    """Renders a scene into a large image file with a pool of processes.
+
+    The scene is a function without arguments that returns a renderer
+    with its props and camera. It is called once in every worker process
+    and must be picklable, so it has to be defined at module level. The
+    image aspect is width / height whatever the camera was set up for.
+    """
+
+    def __init__(self, scene, width, height, tile_size=1024, overlap=16,
+                 number_of_processes=None):
+        self._scene = scene
+        self._width = width
+        self._height = height
+        self._tile_size = tile_size
+        self._overlap = overlap
+        self._number_of_processes = number_of_processes or os.cpu_count()
+
+    def _tasks(self):
+        size = self._tile_size
+        for row in range(math.ceil(self._height / size)):
+            for column in range(math.ceil(self._width / size)):
+                x, y = column * size, row * size
+                yield (column, row, x, y, min(size, self._width - x),
+                       min(size, self._height - y), self._width, self._height,
+                       self._overlap)
+
+    def _tiles(self, pool):
+        """Yields the rendered tiles in row order, a few tasks ahead."""
+        pending = deque()
+        for task in self._tasks():
+            pending.append(pool.apply_async(_render_tile, (task,)))
+            if len(pending) > 2 * self._number_of_processes:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def write(self, filename):
+        """Writes a .png or a tiled .tif file."""
+        extension = os.path.splitext(filename)[1].lower()
+        if extension not in (".png", ".tif", ".tiff"):
+            raise ValueError(f"cannot write {extension} files")
+        window_size = self._tile_size + 2 * self._overlap
+        with Pool(self._number_of_processes, initializer=_start_worker,
+                  initargs=(self._scene, window_size)) as pool:
+            if extension == ".png":
+                writer = PNGStreamWriter(filename, self._width, self._height)
+                across = math.ceil(self._width / self._tile_size)
+                band = []
+                for column, row, pixels in self._tiles(pool):
+                    band.append(pixels)
+                    if len(band) == across:
+                        writer.write_rows(np.concatenate(band, axis=1))
+                        band = []
+            else:
+                writer = TiledTIFFWriter(filename, self._width, self._height,
+                                         self._tile_size)
+                for column, row, pixels in self._tiles(pool):
+                    writer.write_tile(column, row, pixels)
+            writer.close()
+
+
+if __name__ == "__main__":
+    # The worker processes import this file, so the example only runs when
+    # it is executed as a script.
+
+    # 4096 x 4096 keeps the example quick; publication images use 16384.
+    size = 4096
+    output_dir = tempfile.mkdtemp(prefix="vtk_hardcopy_")
+
+    for name in ("office_tubes_large.png", "office_tubes_large.tif"):
+        filename = os.path.join(output_dir, name)
+        start = time.perf_counter()
+        TiledHardcopy(office_scene, size, size).write(filename)
+        print(f"{name}: {time.perf_counter() - start:.2f} s with "
+              f"{os.cpu_count()} processes, "
+              f"{os.path.getsize(filename) / 2 ** 20:.1f} MiB")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Peak memory of the main process: {peak:.0f} MiB")
+
+    # The same image with vtkRenderLargeImage for comparison.
+    renderer = office_scene()
+    render_window = vtkRenderWindow()
+    render_window.OffScreenRenderingOn()
+    render_window.AddRenderer(renderer)
+    render_window.SetSize(1024, 1024)
+    start = time.perf_counter()
+    render_large = vtkRenderLargeImage()
+    render_large.SetInput(renderer)
+    render_large.SetMagnification(size // 1024)
+    writer = vtkPNGWriter()
+    writer.SetInputConnection(render_large.GetOutputPort())
+    writer.SetFileName(os.path.join(output_dir, "office_tubes_render_large.png"))
+    writer.Write()
+    print(f"vtkRenderLargeImage: {time.perf_counter() - start:.2f} s, peak memory "
+          f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+    print(f"Images written to {output_dir}")
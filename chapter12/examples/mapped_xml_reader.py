@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+"""Zero-copy reading of uncompressed appended VTK XML files.
+
+vtkXMLPolyDataReader and vtkXMLUnstructuredGridReader copy every array
+from the file into newly allocated memory. When a .vtp or .vtu file was
+written uncompressed in appended raw mode, the arrays are already stored
+as they are in memory. MappedXMLReader parses only the XML header, maps
+the file into memory and wraps the arrays in place, so a load takes time
+proportional to the header and the array pages are read from disk when
+they are first touched. The mapping is private copy-on-write: processes
+that open the same file share the physical pages of the page cache, and
+anything that modifies an array gets its own copy of the changed pages.
+
+VTK expects the values of an array to be aligned in memory, and the
+writers put the arrays one after another with no regard to alignment, so
+MappedXMLReader copies the arrays that are not aligned. Running
+align_appended_data() on a file once moves its arrays to aligned offsets;
+the file stays a valid VTK XML file. The cell offsets are also copied
+when the file stores them without the leading 0, as VTK writes them for
+compatibility with older readers.
+"""
+import mmap
+import os
+import re
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from vtkmodules.vtkCommonCore import VTK_ID_TYPE, vtkPoints
+from vtkmodules.vtkCommonDataModel import (
+    vtkCellArray,
+    vtkDataObject,
+    vtkPolyData,
+    vtkUnstructuredGrid,
+)
+from vtkmodules.vtkFiltersCore import vtkAppendFilter, vtkElevationFilter
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+from vtkmodules.vtkIOXML import (
+    vtkXMLPolyDataReader,
+    vtkXMLPolyDataWriter,
+    vtkXMLUnstructuredGridReader,
+    vtkXMLUnstructuredGridWriter,
+)
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+from vtkmodules.util.vtkAlgorithm import VTKPythonAlgorithmBase
+
+
+_TYPES = {
+    "Int8": np.int8, "UInt8": np.uint8, "Int16": np.int16, "UInt16": np.uint16,
+    "Int32": np.int32, "UInt32": np.uint32, "Int64": np.int64,
+    "UInt64": np.uint64, "Float32": np.float32, "Float64": np.float64,
+}
+
+_OUTPUT_TYPES = {"PolyData": vtkPolyData, "UnstructuredGrid": vtkUnstructuredGrid}
+
+
+def _read_header(file_name):
+    """Returns (root element, offset of the appended data) of file_name.
+
+    Only the bytes up to the start of the appended data are read.
+    """
+    header = b""
+    with open(file_name, "rb") as f:
+        while True:
+            chunk = f.read(1 << 16)
+            if not chunk:
+                raise ValueError(f"{file_name} has no appended data")
+            start = len(header)
+            header += chunk
+            tag = header.find(b"<AppendedData", max(0, start - 13))
+            if tag >= 0:
+                marker = header.find(b"_", header.find(b">", tag))
+                if marker >= 0:
+                    break
+    root = ET.fromstring(header[:marker].decode() + "</AppendedData></VTKFile>")
+    encoding = root.find("AppendedData").get("encoding")
+    if encoding != "raw":
+        raise ValueError(f"{file_name} has {encoding} appended data, not raw")
+    if root.get("compressor"):
+        raise ValueError(f"{file_name} is compressed with {root.get('compressor')}")
+    if root.get("type") not in _OUTPUT_TYPES:
+        raise ValueError(f"{file_name} holds {root.get('type')}, not polydata "
+                         "or an unstructured grid")
+    order = "LittleEndian" if sys.byteorder == "little" else "BigEndian"
+    if root.get("byte_order") != order:
+        raise ValueError(f"{file_name} is {root.get('byte_order')}")
+    if len(root.find(root.get("type")).findall("Piece")) != 1:
+        raise ValueError(f"{file_name} does not have exactly one piece")
+    return root, marker + 1
+
+
+def align_appended_data(file_name, alignment=8):
+    """Rewrites an appended raw XML file with every array aligned.
+
+    Padding is inserted before each array so that its values start at a
+    multiple of alignment bytes in the file, and the offsets in the header
+    are updated to match.
+    """
+    root, base = _read_header(file_name)
+    header_size = np.dtype(_TYPES[root.get("header_type", "UInt32")]).itemsize
+    with open(file_name, "rb") as f:
+        data = f.read()
+    blocks = sorted({int(a.get("offset")) for a in root.iter("DataArray")
+                     if a.get("format") == "appended"})
+    moved = {}
+    position = 0
+    end = 0
+    for offset in blocks:
+        start = base + offset
+        size = int(np.frombuffer(data, _TYPES[root.get("header_type", "UInt32")], 1, start)[0])
+        position += -(position + header_size) % alignment
+        moved[offset] = (position, data[start:start + header_size + size])
+        position += header_size + size
+        end = max(end, start + header_size + size)
+
+    header = re.sub(rb'offset="(\d+)"',
+                    lambda m: b'offset="%d"' % moved[int(m.group(1))][0],
+                    data[:data.rindex(b"_", 0, base)])
+    # Whitespace before the "_" marker puts the appended data on a boundary.
+    header += b" " * (-(len(header) + 1) % alignment) + b"_"
+    output = bytearray(header)
+    for offset in blocks:
+        position, block = moved[offset]
+        output += bytes(len(header) + position - len(output))
+        output += block
+    output += data[end:]
+    with open(file_name + ".tmp", "wb") as f:
+        f.write(output)
+    os.replace(file_name + ".tmp", file_name)
+
+
+class MappedXMLReader(VTKPythonAlgorithmBase):
+    """Reads uncompressed appended raw .vtp and .vtu files without copying.
+
+    The output is vtkPolyData or vtkUnstructuredGrid, as given by the
+    file. Files that are compressed, base64 encoded, inline, of another
+    byte order or with several pieces are rejected; CanReadFile() tells
+    whether a file can be read, so that callers can fall back to the
+    VTK XML readers. After an update GetNumberOfMappedArrays() and
+    GetNumberOfCopiedArrays() tell how many arrays were wrapped in place.
+    """
+
+    def __init__(self):
+        super().__init__(nInputPorts=0, nOutputPorts=1, outputType="vtkPointSet")
+        self._file_name = None
+        self._mapped = 0
+        self._copied = 0
+
+    def SetFileName(self, file_name):
+        if file_name != self._file_name:
+            self._file_name = file_name
+            self.Modified()
+
+    def GetFileName(self):
+        return self._file_name
+
+    @staticmethod
+    def CanReadFile(file_name):
+        try:
+            _read_header(file_name)
+        except (OSError, ValueError, ET.ParseError):
+            return False
+        return True
+
+    def GetNumberOfMappedArrays(self):
+        return self._mapped
+
+    def GetNumberOfCopiedArrays(self):
+        return self._copied
+
+    def RequestDataObject(self, request, inInfo, outInfo):
+        root, _ = _read_header(self._file_name)
+        output_type = _OUTPUT_TYPES[root.get("type")]
+        info = outInfo.GetInformationObject(0)
+        output = info.Get(vtkDataObject.DATA_OBJECT())
+        if output is None or not isinstance(output, output_type):
+            info.Set(vtkDataObject.DATA_OBJECT(), output_type())
+        return 1
+
+    def _values(self, element):
+        """Returns the values of the DataArray element, in place if aligned."""
+        if element.get("format") != "appended":
+            raise ValueError(f"array {element.get('Name')} is not appended")
+        dtype = np.dtype(_TYPES[element.get("type")])
+        start = self._base + int(element.get("offset"))
+        size = int(np.frombuffer(self._memory, self._header_type, 1, start)[0])
+        start += self._header_type.itemsize
+        values = np.frombuffer(self._memory, dtype, size // dtype.itemsize, start)
+        if start % dtype.itemsize:
+            values = values.copy()
+        components = int(element.get("NumberOfComponents", 1))
+        if components > 1:
+            values = values.reshape(-1, components)
+        return values
+
+    def _wrap(self, values, name):
+        """Returns values as a VTK array that shares their memory."""
+        if self._start <= values.ctypes.data < self._end:
+            self._mapped += 1
+        else:
+            self._copied += 1
+        # 64-bit ids become vtkIdTypeArray, which vtkCellArray uses as is.
+        array = numpy_to_vtk(
+            values, array_type=VTK_ID_TYPE if values.dtype == np.int64 else None)
+        array.SetName(name)
+        return array
+
+    def _array(self, element):
+        return self._wrap(self._values(element), element.get("Name"))
+
+    def _cells(self, element, number_of_cells):
+        arrays = {a.get("Name"): a for a in element.findall("DataArray")}
+        offsets = self._values(arrays["offsets"])
+        if offsets.size == number_of_cells:
+            # Older files leave out the leading 0.
+            offsets = np.concatenate((np.zeros(1, offsets.dtype), offsets))
+        cells = vtkCellArray()
+        cells.SetData(self._wrap(offsets, "offsets"),
+                      self._array(arrays["connectivity"]))
+        return cells, arrays
+
+    def RequestData(self, request, inInfo, outInfo):
+        root, self._base = _read_header(self._file_name)
+        self._header_type = np.dtype(_TYPES[root.get("header_type", "UInt32")])
+        self._mapped = self._copied = 0
+        with open(self._file_name, "rb") as f:
+            self._memory = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        self._start = np.frombuffer(self._memory, np.uint8).ctypes.data
+        self._end = self._start + len(self._memory)
+        try:
+            output = vtkDataObject.GetData(outInfo)
+            output.Initialize()
+            piece = root.find(root.get("type")).find("Piece")
+
+            points = piece.find("Points/DataArray")
+            if points is not None:
+                vtk_points = vtkPoints()
+                vtk_points.SetData(self._array(points))
+                output.SetPoints(vtk_points)
+
+            if isinstance(output, vtkPolyData):
+                for name, setter in (("Verts", output.SetVerts),
+                                     ("Lines", output.SetLines),
+                                     ("Strips", output.SetStrips),
+                                     ("Polys", output.SetPolys)):
+                    count = int(piece.get(f"NumberOf{name}", 0))
+                    element = piece.find(name)
+                    if count and element is not None:
+                        setter(self._cells(element, count)[0])
+            else:
+                count = int(piece.get("NumberOfCells"))
+                cells, arrays = self._cells(piece.find("Cells"), count)
+                output.SetCells(self._array(arrays["types"]), cells)
+
+            for name, data in (("PointData", output.GetPointData()),
+                               ("CellData", output.GetCellData())):
+                element = piece.find(name)
+                if element is None:
+                    continue
+                for array_element in element.findall("DataArray"):
+                    data.AddArray(self._array(array_element))
+                for attribute in ("Scalars", "Vectors", "Normals", "Tensors", "TCoords"):
+                    if element.get(attribute):
+                        getattr(data, f"SetActive{attribute}")(element.get(attribute))
+        finally:
+            # The arrays keep the mapping open for as long as they exist.
+            del self._memory
+        return 1
+
+
+# The sphere of write_data.py with a million points, written the way the
+# mapped reader wants it: appended, raw, uncompressed and aligned.
+sphere = vtkSphereSource()
+sphere.SetThetaResolution(1000)
+sphere.SetPhiResolution(1000)
+elevation = vtkElevationFilter()
+elevation.SetInputConnection(sphere.GetOutputPort())
+to_grid = vtkAppendFilter()
+to_grid.SetInputConnection(elevation.GetOutputPort())
+
+output_dir = tempfile.mkdtemp(prefix="vtk_mapped_")
+files = []
+for extension, writer, source, reader_class in (
+        (".vtp", vtkXMLPolyDataWriter(), elevation, vtkXMLPolyDataReader),
+        (".vtu", vtkXMLUnstructuredGridWriter(), to_grid, vtkXMLUnstructuredGridReader)):
+    file_name = os.path.join(output_dir, "sphere" + extension)
+    writer.SetInputConnection(source.GetOutputPort())
+    writer.SetFileName(file_name)
+    writer.SetDataModeToAppended()
+    writer.EncodeAppendedDataOff()
+    writer.SetCompressorTypeToNone()
+    writer.Write()
+    align_appended_data(file_name)
+    files.append((file_name, reader_class))
+
+repeats = 20
+for file_name, reader_class in files:
+    print(f"{os.path.basename(file_name)}: {os.path.getsize(file_name) / 2 ** 20:.1f} MiB")
+    for reader in (reader_class(), MappedXMLReader()):
+        reader.SetFileName(file_name)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            reader.Modified()
+            reader.Update()
+        elapsed = (time.perf_counter() - start) / repeats
+        print(f"  {type(reader).__name__:<30} {1000 * elapsed:8.2f} ms per load")
+    print(f"  {reader.GetNumberOfMappedArrays()} arrays mapped, "
+          f"{reader.GetNumberOfCopiedArrays()} copied")
+
+    # Both readers give the same dataset.
+    expected = reader_class()
+    expected.SetFileName(file_name)
+    expected.Update()
+    mapped = reader.GetOutputDataObject(0)
+    same = np.array_equal(vtk_to_numpy(mapped.GetPoints().GetData()),
+                          vtk_to_numpy(expected.GetOutput().GetPoints().GetData()))
+    same &= mapped.GetNumberOfCells() == expected.GetOutput().GetNumberOfCells()
+    print(f"  same points and cells as {reader_class.__name__}: {same}")
+
+print(f"\nFiles written to {output_dir}")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+"""Movie export with rendering and encoding running side by side.
+
+The loop in "Creating Movie Files" renders a frame, encodes it, and only
+then renders the next one. MovieExporter hands each rendered frame to an
+encoder process through a bounded queue of frame slots in shared memory,
+so the next frame is rendered while the previous ones are encoded. When
+the encoder falls behind, the queue fills up and write() waits for a free
+slot. The encoder pipes the frames to the ffmpeg program when it is
+installed and otherwise writes a numbered PNG sequence.
+
+The example turns the cone of Cone2.py through 360 degrees, once with
+rendering and encoding alternating and once with MovieExporter, and
+prints the frames per second of both.
+"""
+
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import time
+from multiprocessing import Process, Queue, shared_memory
+
+import numpy as np
+
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+from vtkmodules.vtkCommonCore import vtkUnsignedCharArray
+from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkFiltersSources import vtkConeSource
+from vtkmodules.vtkIOImage import vtkPNGWriter
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderer,
+    vtkRenderWindow,
+)
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401
+
+
+class FrameEncoder:
+    """Encodes RGB frames, stored bottom row first as VTK reads them.
+
+    With ffmpeg on the PATH the frames become an H.264 movie; otherwise
+    filename is used as a directory for frame_0000.png, frame_0001.png...
+    """
+
+    def __init__(self, filename, width, height, frame_rate):
+        self.filename = filename
+        self._ffmpeg = None
+        self._frame = 0
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg:
+            self._ffmpeg = subprocess.Popen(
+                [ffmpeg, "-loglevel", "error", "-y", "-f", "rawvideo",
+                 "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+                 "-r", str(frame_rate), "-i", "-", "-vf", "vflip",
+                 "-c:v", "libx264", "-pix_fmt", "yuv420p", filename],
+                stdin=subprocess.PIPE)
+        else:
+            self.filename = os.path.splitext(filename)[0]
+            os.makedirs(self.filename, exist_ok=True)
+            self._image = vtkImageData()
+            self._image.SetDimensions(width, height, 1)
+            self._png = vtkPNGWriter()
+            self._png.SetInputData(self._image)
+
+    def write(self, pixels):
+        """Encodes a (height, width, 3) uint8 frame."""
+        if self._ffmpeg:
+            self._ffmpeg.stdin.write(pixels.tobytes())
+        else:
+            self._image.GetPointData().SetScalars(
+                numpy_to_vtk(pixels.reshape(-1, 3)))
+            self._png.SetFileName(
+                os.path.join(self.filename, f"frame_{self._frame:04d}.png"))
+            self._png.Write()
+        self._frame += 1
+
+    def close(self):
+        if self._ffmpeg:
+            self._ffmpeg.stdin.close()
+            if self._ffmpeg.wait():
+                raise RuntimeError(f"ffmpeg exited with status {self._ffmpeg.returncode}")
+
+
+def _encode(memory_name, shape, filled, free, filename, frame_rate):
+    """Encoder process: encodes the slots put on filled until it gets None."""
+    memory = shared_memory.SharedMemory(name=memory_name)
+    slots = np.ndarray(shape, dtype=np.uint8, buffer=memory.buf)
+    try:
+        encoder = FrameEncoder(filename, shape[2], shape[1], frame_rate)
+        while (slot := filled.get()) is not None:
+            encoder.write(slots[slot])
+            free.put(slot)
+        encoder.close()
+    except BaseException:
+        # Wake the parent if it is waiting for a free slot, so that it
+        # reports the failure instead of waiting forever.
+        free.put(None)
+        raise
+    finally:
+        del slots
+        memory.close()
+
+
+def grab_frame(render_window, array):
+    """Reads the back buffer of render_window into array; returns it as numpy."""
+    width, height = render_window.GetSize()
+    render_window.GetPixelData(0, 0, width - 1, height - 1, 0, array, 0)
+    return vtk_to_numpy(array).reshape(height, width, 3)
+
+
+class MovieExporter:
+    """Writes the frames of a render window to a movie in another process.
+
+    Call start(), then write() after each render, then end(). Up to
+    queue_size frames wait in shared memory for the encoder; write()
+    blocks while the queue is full. If the encoder process fails, write()
+    or end() raises RuntimeError with its exit code. The window size must
+    not change between start() and end().
+    """
+
+    def __init__(self, render_window, filename, frame_rate=30, queue_size=8):
+        self._render_window = render_window
+        self.filename = filename
+        self._frame_rate = frame_rate
+        self._queue_size = queue_size
+        self._array = vtkUnsignedCharArray()
+        self._process = None
+        self.frames = 0
+        self.wait_time = 0.0
+        self.elapsed = 0.0
+
+    def start(self):
+        width, height = self._render_window.GetSize()
+        shape = (self._queue_size, height, width, 3)
+        self._memory = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+        self._slots = np.ndarray(shape, dtype=np.uint8, buffer=self._memory.buf)
+        self._filled = Queue()
+        self._free = Queue()
+        for slot in range(self._queue_size):
+            self._free.put(slot)
+        self._process = Process(
+            target=_encode,
+            args=(self._memory.name, shape, self._filled, self._free,
+                  self.filename, self._frame_rate))
+        self._process.start()
+        self.frames = 0
+        self.wait_time = 0.0
+        self._start = time.perf_counter()
+
+    def write(self):
+        """Queues the current contents of the render window."""
+        waited = time.perf_counter()
+        slot = None
+        while slot is None:
+            try:
+                slot = self._free.get(timeout=1.0)
+            except queue.Empty:
+                if self._process.is_alive():
+                    continue
+            if slot is None:
+                self._release()
+                raise RuntimeError(f"the encoder process failed with exit code {self._process.exitcode}")
+        self.wait_time += time.perf_counter() - waited
+        self._slots[slot] = grab_frame(self._render_window, self._array)
+        self._filled.put(slot)
+        self.frames += 1
+
+    def end(self):
+        """Waits for the encoder to finish the queued frames."""
+        self._filled.put(None)
+        self._release()
+        self.elapsed = time.perf_counter() - self._start
+        if self._process.exitcode:
+            raise RuntimeError(f"the encoder process failed with exit code {self._process.exitcode}")
+
+    def _release(self):
+        """Waits for the encoder process to exit and frees the slots."""
+        self._process.join()
+        del self._slots
+        self._memory.close()
+        self._memory.unlink()
+
+    def get_frame_rate(self):
+        """Returns the frames per second of the last export, encoding included."""
+        return self.frames / self.elapsed
+
+
+if __name__ == "__main__":
+    # The encoder process may import this file, so the example only runs
+    # when it is executed as a script.
+
+    # The pipeline of Cone2.py
+    cone = vtkConeSource()
+    cone.SetHeight(3.0)
+    cone.SetRadius(1.0)
+    cone.SetResolution(10)
+
+    cone_mapper = vtkPolyDataMapper()
+    cone_mapper.SetInputConnection(cone.GetOutputPort())
+
+    cone_actor = vtkActor()
+    cone_actor.SetMapper(cone_mapper)
+
+    renderer = vtkRenderer()
+    renderer.AddActor(cone_actor)
+    renderer.SetBackground(0.1, 0.2, 0.4)
+
+    render_window = vtkRenderWindow()
+    render_window.OffScreenRenderingOn()
+    render_window.AddRenderer(renderer)
+    render_window.SetSize(640, 480)
+    renderer.ResetCamera()
+    camera = renderer.GetActiveCamera()
+    output_dir = tempfile.mkdtemp(prefix="vtk_movie_")
+
+    # Render, then encode, one frame at a time.
+    render_window.Render()
+    width, height = render_window.GetSize()
+    encoder = FrameEncoder(os.path.join(output_dir, "serial.mp4"), width, height, 30)
+    array = vtkUnsignedCharArray()
+    start = time.perf_counter()
+    for i in range(360):
+        render_window.Render()
+        encoder.write(grab_frame(render_window, array))
+        camera.Azimuth(1)
+    encoder.close()
+    serial = 360 / (time.perf_counter() - start)
+
+    # Render while the encoder process works through the queue.
+    exporter = MovieExporter(render_window, os.path.join(output_dir, "orbit.mp4"))
+    exporter.start()
+    for i in range(360):
+        render_window.Render()
+        exporter.write()
+        camera.Azimuth(1)
+    exporter.end()
+
+    print(f"Encoding with {'ffmpeg' if shutil.which('ffmpeg') else 'PNG sequence'}, "
+          f"{width} x {height}")
+    print(f"Render then encode: {serial:.1f} frames per second")
+    print(f"MovieExporter: {exporter.get_frame_rate():.1f} frames per second, "
+          f"{exporter.wait_time:.2f} s waiting for the encoder")
+    print(f"Movies written to {output_dir}")
@@ -0,0 +1,458 @@
+#!/usr/bin/env python
+"""Multithreaded reading of ASCII legacy VTK files.
+
+vtkPolyDataReader, vtkUnstructuredGridReader and the other legacy readers
+parse the numbers of an ASCII ".vtk" file one at a time on one thread, so
+a file of a few gigabytes takes minutes to read. ThreadedLegacyReader
+reads the keywords of the file (POINTS, CELLS, POINT_DATA, SCALARS, ...)
+one line at a time as they do, but hands each block of numbers to a pool
+of threads. The block is cut into chunks at whitespace, so that no
+number is split; the threads count the numbers of each chunk to find
+where the block ends, then parse the chunks into one preallocated array.
+NumPy releases the GIL while it parses text, so the chunks are parsed at
+the same time.
+
+The whole file is mapped into memory rather than read, and only the
+chunks being parsed are copied out of it. Binary files, and sections the
+reader does not know, are passed on to vtkDataSetReader.
+"""
+import mmap
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+import numpy as np
+
+from vtkmodules.vtkCommonCore import VTK_ID_TYPE, vtkPoints
+from vtkmodules.vtkCommonDataModel import (
+    vtkCellArray,
+    vtkDataObject,
+    vtkPolyData,
+    vtkRectilinearGrid,
+    vtkStructuredGrid,
+    vtkStructuredPoints,
+    vtkUnstructuredGrid,
+)
+from vtkmodules.vtkFiltersCore import vtkAppendFilter, vtkElevationFilter
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+from vtkmodules.vtkIOLegacy import (
+    vtkDataSetReader,
+    vtkPolyDataWriter,
+    vtkUnstructuredGridWriter,
+)
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+from vtkmodules.util.vtkAlgorithm import VTKPythonAlgorithmBase
+
+
+_TYPES = {
+    "char": np.int8, "signed_char": np.int8, "unsigned_char": np.uint8,
+    "short": np.int16, "unsigned_short": np.uint16, "int": np.int32,
+    "unsigned_int": np.uint32, "long": np.int64, "unsigned_long": np.uint64,
+    "vtktypeint64": np.int64, "vtktypeuint64": np.uint64, "vtkidtype": np.int64,
+    "float": np.float32, "double": np.float64,
+}
+
+_OUTPUT_TYPES = {
+    "POLYDATA": vtkPolyData,
+    "UNSTRUCTURED_GRID": vtkUnstructuredGrid,
+    "STRUCTURED_POINTS": vtkStructuredPoints,
+    "STRUCTURED_GRID": vtkStructuredGrid,
+    "RECTILINEAR_GRID": vtkRectilinearGrid,
+}
+
+# Number of components of the attributes with a fixed number of them.
+_COMPONENTS = {"VECTORS": 3, "NORMALS": 3, "TENSORS": 9}
+
+_SPACE = np.zeros(256, bool)
+_SPACE[list(b" \t\n\r\v\f")] = True
+_WHITESPACE = re.compile(rb"\s")
+
+
+def _token_ends(data):
+    """Returns the position just past each whitespace-separated token of data."""
+    space = _SPACE[np.frombuffer(data, np.uint8)]
+    return np.flatnonzero(~space & np.append(space[1:], True)) + 1
+
+
+class _Unsupported(Exception):
+    """Raised for file contents that are left to vtkDataSetReader."""
+
+
+def _read_header(file_name):
+    """Returns (title, file type, dataset type) of a legacy VTK file."""
+    with open(file_name, "rb") as f:
+        if not f.readline().startswith(b"# vtk DataFile"):
+            raise ValueError(f"{file_name} is not a legacy VTK file")
+        title = f.readline().decode("latin-1").strip()
+        words = []
+        for line in f:
+            words += line.decode("latin-1").split()
+            if len(words) >= 3:
+                break
+    if len(words) < 3 or words[1].upper() != "DATASET":
+        raise ValueError(f"{file_name} does not hold a dataset")
+    if words[2].upper() not in _OUTPUT_TYPES:
+        raise ValueError(f"{file_name} holds an unknown dataset {words[2]}")
+    return title, words[0].upper(), words[2].upper()
+
+
+class ThreadedLegacyReader(VTKPythonAlgorithmBase):
+    """Reads ASCII legacy VTK dataset files on several threads.
+
+    The output is the dataset type given by the file, as for
+    vtkDataSetReader. Every attribute array in the file is read, as with
+    the ReadAll...On() options of the legacy readers, and the first array
+    of each attribute type becomes the active one. Blocks of numbers are
+    cut into chunks of about GetChunkSize() bytes, which are parsed by
+    GetNumberOfThreads() threads.
+    """
+
+    def __init__(self):
+        super().__init__(nInputPorts=0, nOutputPorts=1, outputType="vtkDataSet")
+        self._file_name = None
+        self._number_of_threads = os.cpu_count() or 1
+        self._chunk_size = 1 << 22
+        self._header = None
+
+    def SetFileName(self, file_name):
+        if file_name != self._file_name:
+            self._file_name = file_name
+            self.Modified()
+
+    def GetFileName(self):
+        return self._file_name
+
+    def SetNumberOfThreads(self, number_of_threads):
+        if number_of_threads != self._number_of_threads:
+            self._number_of_threads = number_of_threads
+            self.Modified()
+
+    def GetNumberOfThreads(self):
+        return self._number_of_threads
+
+    def SetChunkSize(self, chunk_size):
+        if chunk_size != self._chunk_size:
+            self._chunk_size = chunk_size
+            self.Modified()
+
+    def GetChunkSize(self):
+        return self._chunk_size
+
+    def GetHeader(self):
+        return self._header
+
+    def RequestDataObject(self, request, inInfo, outInfo):
+        _, _, dataset_type = _read_header(self._file_name)
+        output_type = _OUTPUT_TYPES[dataset_type]
+        info = outInfo.GetInformationObject(0)
+        output = info.Get(vtkDataObject.DATA_OBJECT())
+        if output is None or type(output) is not output_type:
+            info.Set(vtkDataObject.DATA_OBJECT(), output_type())
+        return 1
+
+    def _raw_line(self):
+        """Returns the next line of the file, or None at its end."""
+        if self._position >= len(self._memory):
+            return None
+        end = self._memory.find(b"\n", self._position)
+        if end < 0:
+            end = len(self._memory)
+        line = self._memory[self._position:end].decode("latin-1").strip()
+        self._position = end + 1
+        return line
+
+    def _line(self):
+        """Returns the next line that is neither blank nor metadata."""
+        while True:
+            line = self._raw_line()
+            if line is None or line.upper() == "METADATA":
+                # A metadata block ends with a blank line.
+                while line:
+                    line = self._raw_line()
+                if line is None:
+                    return None
+            elif line:
+                return line
+
+    def _peek(self, keyword):
+        """Consumes the next line if it starts with keyword and returns it."""
+        position = self._position
+        line = self._line()
+        if line is not None and line.upper().startswith(keyword):
+            return line
+        self._position = position
+        return None
+
+    def _chunks(self, start, count):
+        """Returns [(begin, end)] byte ranges holding the next count numbers."""
+        memory = self._memory
+        chunks = []
+        found = 0
+        begin = start
+        while found < count:
+            if begin >= len(memory):
+                raise ValueError(f"{self._file_name} ends inside a block of numbers")
+            # Guess generously at 16 bytes a number, so that one round of
+            # chunks usually covers the block.
+            size = min(self._chunk_size,
+                       max(1 << 16, 16 * (count - found) // self._number_of_threads))
+            batch = []
+            for _ in range(self._number_of_threads):
+                if begin >= len(memory):
+                    break
+                # Chunks end at whitespace, so that no number is split.
+                match = _WHITESPACE.search(memory, min(begin + size, len(memory)))
+                end = match.start() if match else len(memory)
+                batch.append((begin, end))
+                begin = end
+            # list() propagates any exception raised inside a worker.
+            counts = list(self._pool.map(
+                lambda chunk: _token_ends(memory[chunk[0]:chunk[1]]).size, batch))
+            for chunk, number in zip(batch, counts):
+                if found + number >= count:
+                    last = _token_ends(memory[chunk[0]:chunk[1]])[count - found - 1]
+                    chunks.append((chunk[0], chunk[0] + last))
+                    return chunks
+                if number:
+                    chunks.append(chunk)
+                found += number
+        return chunks
+
+    def _numbers(self, count, dtype):
+        """Parses the next count numbers of the file into an array of dtype."""
+        values = np.empty(count, dtype)
+        if count == 0:
+            return values
+        chunks = self._chunks(self._position, count)
+        memory = self._memory
+        # list() propagates any exception raised inside a worker.
+        pieces = list(self._pool.map(
+            lambda chunk: np.fromstring(memory[chunk[0]:chunk[1]], dtype, sep=" "),
+            chunks))
+        if sum(piece.size for piece in pieces) != count:
+            raise ValueError(f"{self._file_name} has a malformed number near byte "
+                             f"{self._position}")
+        np.concatenate(pieces, out=values)
+        self._position = chunks[-1][1]
+        return values
+
+    def _array(self, name, type_name, count, components=1):
+        """Reads count tuples of a named array."""
+        dtype = _TYPES.get(type_name.lower())
+        if dtype is None:
+            raise _Unsupported(f"arrays of type {type_name}")
+        values = self._numbers(count * components, dtype)
+        if components > 1:
+            values = values.reshape(count, components)
+        array = numpy_to_vtk(
+            values, array_type=VTK_ID_TYPE if type_name.lower() == "vtkidtype" else None)
+        array.SetName(unquote(name))
+        return array
+
+    def _cells(self, words):
+        """Reads the cells of a CELLS, POLYGONS, ... section."""
+        cells = vtkCellArray()
+        if self._peek("OFFSETS"):
+            offsets = self._numbers(int(words[0]), np.int64)
+            if not self._peek("CONNECTIVITY"):
+                raise ValueError(f"{self._file_name} has offsets but no connectivity")
+            connectivity = self._numbers(int(words[1]), np.int64)
+            cells.SetData(numpy_to_vtk(offsets, array_type=VTK_ID_TYPE),
+                          numpy_to_vtk(connectivity, array_type=VTK_ID_TYPE))
+        else:
+            # Before version 5.1 each cell is its number of points and the ids.
+            cells.ImportLegacyFormat(
+                numpy_to_vtk(self._numbers(int(words[1]), np.int64), array_type=VTK_ID_TYPE))
+        return cells
+
+    def _field(self, data, count):
+        """Reads the arrays of a FIELD section into data."""
+        for _ in range(count):
+            words = self._line().split()
+            if words[0].upper() != "NULL_ARRAY":
+                name, components, tuples, type_name = words[:4]
+                data.AddArray(self._array(name, type_name, int(tuples), int(components)))
+
+    def _attribute(self, keyword, words, data, count):
+        """Reads a SCALARS, VECTORS, ... section into data."""
+        if keyword == "SCALARS":
+            components = int(words[2]) if len(words) > 2 else 1
+            self._peek("LOOKUP_TABLE")
+        elif keyword == "TEXTURE_COORDINATES":
+            components = int(words[1])
+            words = [words[0], words[2]]
+        elif keyword in _COMPONENTS:
+            components = _COMPONENTS[keyword]
+        else:
+            raise _Unsupported(f"{keyword} sections")
+        array = self._array(words[0], words[1], count, components)
+        attribute = {"SCALARS": "Scalars", "VECTORS": "Vectors", "NORMALS": "Normals",
+                     "TENSORS": "Tensors", "TEXTURE_COORDINATES": "TCoords"}[keyword]
+        if getattr(data, f"Get{attribute}")() is None:
+            getattr(data, f"Set{attribute}")(array)
+        else:
+            data.AddArray(array)
+
+    def _read(self, output):
+        self._raw_line()
+        self._header = self._raw_line()
+        if self._line().upper() != "ASCII":
+            raise _Unsupported("binary files")
+        self._line()
+        data = output.GetFieldData()
+        count = 0
+        cell_types = cells = None
+        while (line := self._line()) is not None:
+            keyword, *words = line.split()
+            keyword = keyword.upper()
+            if keyword == "DIMENSIONS":
+                output.SetDimensions(*map(int, words[:3]))
+            elif keyword in ("SPACING", "ASPECT_RATIO"):
+                output.SetSpacing(*map(float, words[:3]))
+            elif keyword == "ORIGIN":
+                output.SetOrigin(*map(float, words[:3]))
+            elif keyword == "POINTS":
+                points = vtkPoints()
+                points.SetData(self._array("Points", words[1], int(words[0]), 3))
+                output.SetPoints(points)
+            elif keyword in ("X_COORDINATES", "Y_COORDINATES", "Z_COORDINATES"):
+                array = self._array(keyword, words[1], int(words[0]))
+                getattr(output, f"Set{keyword[0]}Coordinates")(array)
+            elif keyword in ("VERTICES", "LINES", "POLYGONS", "TRIANGLE_STRIPS"):
+                setter = {"VERTICES": output.SetVerts, "LINES": output.SetLines,
+                          "POLYGONS": output.SetPolys, "TRIANGLE_STRIPS": output.SetStrips}
+                setter[keyword](self._cells(words))
+            elif keyword == "CELLS":
+                cells = self._cells(words)
+            elif keyword == "CELL_TYPES":
+                cell_types = numpy_to_vtk(self._numbers(int(words[0]), np.uint8))
+            elif keyword in ("POINT_DATA", "CELL_DATA"):
+                data = output.GetPointData() if keyword == "POINT_DATA" else output.GetCellData()
+                count = int(words[0])
+            elif keyword == "FIELD":
+                self._field(data, int(words[1]))
+            else:
+                self._attribute(keyword, words, data, count)
+        if cells is not None:
+            output.SetCells(cell_types, cells)
+
+    def RequestData(self, request, inInfo, outInfo):
+        output = vtkDataObject.GetData(outInfo)
+        output.Initialize()
+        with open(self._file_name, "rb") as f:
+            self._memory = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._position = 0
+        try:
+            with ThreadPoolExecutor(self._number_of_threads) as self._pool:
+                self._read(output)
+        except _Unsupported:
+            output.Initialize()
+            reader = vtkDataSetReader()
+            reader.SetFileName(self._file_name)
+            for attribute in ("Scalars", "Vectors", "Normals", "Tensors",
+                              "TCoords", "ColorScalars", "Fields"):
+                getattr(reader, f"ReadAll{attribute}On")()
+            reader.Update()
+            output.ShallowCopy(reader.GetOutput())
+            self._header = reader.GetHeader()
+        finally:
+            self._memory.close()
+            del self._memory, self._pool
+        return 1
+
+
+def same_data(a, b):
+    """Tells whether two datasets have the same geometry, cells and arrays."""
+    if type(a) is not type(b) or a.GetNumberOfPoints() != b.GetNumberOfPoints():
+        return False
+    pairs = []
+    if isinstance(a, (vtkPolyData, vtkUnstructuredGrid, vtkStructuredGrid)):
+        pairs.append((a.GetPoints().GetData(), b.GetPoints().GetData()))
+    getters = {vtkPolyData: ("GetVerts", "GetLines", "GetPolys", "GetStrips"),
+               vtkUnstructuredGrid: ("GetCells",)}.get(type(a), ())
+    for getter in getters:
+        cells_a, cells_b = getattr(a, getter)(), getattr(b, getter)()
+        pairs += [(cells_a.GetOffsetsArray(), cells_b.GetOffsetsArray()),
+                  (cells_a.GetConnectivityArray(), cells_b.GetConnectivityArray())]
+    if isinstance(a, vtkUnstructuredGrid):
+        pairs.append((a.GetCellTypes(), b.GetCellTypes()))
+    for data_a, data_b in ((a.GetPointData(), b.GetPointData()),
+                           (a.GetCellData(), b.GetCellData())):
+        if data_a.GetNumberOfArrays() != data_b.GetNumberOfArrays():
+            return False
+        pairs += [(data_a.GetArray(i), data_b.GetArray(data_a.GetArrayName(i)))
+                  for i in range(data_a.GetNumberOfArrays())]
+    return all(y is not None and np.array_equal(vtk_to_numpy(x), vtk_to_numpy(y))
+               for x, y in pairs)
+
+
+def vtk_reader(file_name):
+    reader = vtkDataSetReader()
+    reader.SetFileName(file_name)
+    for attribute in ("Scalars", "Vectors", "Normals", "Tensors", "TCoords", "Fields"):
+        getattr(reader, f"ReadAll{attribute}On")()
+    return reader
+
+
+# The legacy files used by the examples of the other chapters.
+examples_dir = os.path.dirname(os.path.abspath(__file__))
+for file_name in (os.path.join(examples_dir, "..", "..", "chapter05", "data", "fran_cut.vtk"),
+                  os.path.join(examples_dir, "..", "..", "chapter05", "data", "blow.vtk"),
+                  os.path.join(examples_dir, "..", "..", "chapter10", "data", "hello.vtk"),
+                  os.path.join(examples_dir, "..", "..", "chapter07", "data", "ironProt.vtk")):
+    reader = ThreadedLegacyReader()
+    reader.SetFileName(file_name)
+    reader.Update()
+    expected = vtk_reader(file_name)
+    expected.Update()
+    output = reader.GetOutputDataObject(0)
+    print(f"{os.path.basename(file_name)} ({_read_header(file_name)[1]}): "
+          f"{output.GetClassName()} with {output.GetNumberOfPoints()} points, "
+          f"same as vtkDataSetReader: {same_data(output, expected.GetOutput())}")
+
+# A sphere with half a million points, written in the cell layout of
+# version 5.1 as polydata and in the older one as an unstructured grid.
+sphere = vtkSphereSource()
+sphere.SetThetaResolution(700)
+sphere.SetPhiResolution(700)
+elevation = vtkElevationFilter()
+elevation.SetInputConnection(sphere.GetOutputPort())
+to_grid = vtkAppendFilter()
+to_grid.SetInputConnection(elevation.GetOutputPort())
+
+output_dir = tempfile.mkdtemp(prefix="vtk_legacy_")
+for name, writer, source, version in (
+        ("sphere.vtk", vtkPolyDataWriter(), elevation, 51),
+        ("sphere_grid.vtk", vtkUnstructuredGridWriter(), to_grid, 42)):
+    file_name = os.path.join(output_dir, name)
+    writer.SetInputConnection(source.GetOutputPort())
+    writer.SetFileName(file_name)
+    writer.SetFileTypeToASCII()
+    writer.SetFileVersion(version)
+    writer.Write()
+    print(f"\n{name}: {os.path.getsize(file_name) / 2 ** 20:.0f} MiB")
+
+    expected = vtk_reader(file_name)
+    start = time.perf_counter()
+    expected.Update()
+    print(f"  vtkDataSetReader                {time.perf_counter() - start:6.2f} s")
+    for threads in sorted({1, os.cpu_count() or 1}):
+        reader = ThreadedLegacyReader()
+        reader.SetFileName(file_name)
+        reader.SetNumberOfThreads(threads)
+        start = time.perf_counter()
+        reader.Update()
+        print(f"  ThreadedLegacyReader, {threads:2d} threads {time.perf_counter() - start:6.2f} s")
+    print(f"  same as vtkDataSetReader: "
+          f"{same_data(reader.GetOutputDataObject(0), expected.GetOutput())}")
+
+if "--keep-files" in sys.argv:
+    print(f"\nFiles written to {output_dir}")
+else:
+    for name in os.listdir(output_dir):
+        os.remove(os.path.join(output_dir, name))
+    os.rmdir(output_dir)